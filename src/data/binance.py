@@ -1,9 +1,18 @@
 from typing import Literal, List, Tuple, Callable
 from datetime import datetime, timedelta
+import functools
 import requests
 import pandas as pd
+import os
+import pickle
 import time
 
+# On-disk copy of /api/v3/exchangeInfo shared by every process, refreshed after the TTL
+EXCHANGE_INFO_CACHE = os.environ.get(
+    'BINANCE_EXCHANGE_INFO_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'binance', 'exchange_info.pkl')
+)
+EXCHANGE_INFO_TTL = float(os.environ.get('BINANCE_EXCHANGE_INFO_TTL', 24 * 3600))  # in seconds
+
 
 class RateLimitFactory:
     def __init__(self, interval: int, limit: int):
@@ -99,9 +108,16 @@ class BinanceSymbol:
 
 
 class BinanceInformation:
-    def __init__(self):
+    def __init__(self, cache_path: str | None = None, ttl: float = EXCHANGE_INFO_TTL):
+        """
+        Args:
+            cache_path: exchange info cache file. None always requests it
+            ttl: seconds a cached exchange info stays fresh
+        """
         self.base_url = 'https://api.binance.com'
-        self.exchange_info = self.get_info()
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.exchange_info = self.get_cached_info() if cache_path is not None else self.get_info()
 
     def get_info(self):
         endpoint = '/api/v3/exchangeInfo'
@@ -110,7 +126,34 @@ class BinanceInformation:
             return r.json()
         else:
             raise Exception(f'Error: {r.status_code} {r.text}')
-        
+
+    def get_cached_info(self):
+        """Exchange info from the cache while fresh, else requested and cached. A stale cache is used when the request fails"""
+        try:
+            fresh = time.time() - os.path.getmtime(self.cache_path) < self.ttl
+        except OSError:
+            fresh = None  # No cache
+        if fresh:
+            with open(self.cache_path, 'rb') as f:
+                return pickle.load(f)
+
+        try:
+            info = self.get_info()
+        except Exception as e:
+            if fresh is None:
+                raise
+            print(f"Exchange info request failed ({e}), using the stale cache {self.cache_path}")
+            with open(self.cache_path, 'rb') as f:
+                return pickle.load(f)
+
+        # Through a temporary file so concurrent processes never read a partial cache
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp = f"{self.cache_path}.tmp-{os.getpid()}"
+        with open(tmp, 'wb') as f:
+            pickle.dump(info, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_path)
+        return info
+
     def get_rate_limits(self):
         return BinanceRateLimitsFactory(self.exchange_info['rateLimits'])
 
@@ -128,15 +171,43 @@ class BinanceInformation:
         return BinanceSymbol(symbols)
 
 
-# Create Exchange info and rate limits
-bi = BinanceInformation()
-
-# Trading symbols
-symbol_searcher = bi.get_trading_symbols()
-
-# Rate limits
-_rate_limits = bi.get_rate_limits()  # Hidden to the user
-weight_limiter = _rate_limits.get_request_weight_limit()
+@functools.lru_cache(maxsize=None)
+def _bootstrap() -> dict:
+    """Exchange info, trading symbols and rate limits, built on first use (from the cache when fresh)"""
+    bi = BinanceInformation(cache_path=EXCHANGE_INFO_CACHE)
+    rate_limits = bi.get_rate_limits()
+    return {
+        'bi': bi,
+        'symbol_searcher': bi.get_trading_symbols(),
+        '_rate_limits': rate_limits,  # Hidden to the user
+        'weight_limiter': rate_limits.get_request_weight_limit(),
+    }
+
+
+def __getattr__(name: str):
+    # Module attributes `bi`, `symbol_searcher`, `weight_limiter` resolve lazily: importing this module
+    # makes no request
+    if name in ('bi', 'symbol_searcher', '_rate_limits', 'weight_limiter'):
+        return _bootstrap()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def weight_limited(weight_func: Callable | int | None = None):
+    """
+    `weight_limiter.update` resolved on the first call, so decorating does not need the exchange info.
+    The limited function is built once then and reused by every later call
+    """
+    def decorator(func):
+        limited = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal limited
+            if limited is None:
+                limited = _bootstrap()['weight_limiter'].update(weight_func=weight_func)(func)
+            return limited(*args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class BinanceHistory:
@@ -183,7 +254,7 @@ class BinanceHistory:
         else:
             return 2    
 
-    @weight_limiter.update(weight_func=_calculate_klines_weight)  # weight is 2 for each request
+    @weight_limited(weight_func=_calculate_klines_weight)  # weight is 2 for each request
     def klines(self, 
                interval: Literal['1s', '1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w', '1M'] = '1s',
                time: Tuple[datetime, datetime] | None = None,  # startTime - Long (Timestamp) 1499040000000
@@ -249,3 +320,46 @@ class BinanceHistory:
 
         return pd.concat(data)
 
+
+
+if __name__ == "__main__":
+    # Import time with a warm cache: fresh interpreters import the module and build `symbol_searcher` /
+    # `weight_limiter`, as a notebook kernel or worker process does. Uses the cache at
+    # EXCHANGE_INFO_CACHE if it is fresh, else a synthetic exchange info of the real size (~3000 symbols)
+    import subprocess
+    import sys
+    import tempfile
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = (
+        "import time; start = time.perf_counter(); import pandas; pandas_done = time.perf_counter(); "
+        "import src.data.binance as b; import_done = time.perf_counter(); "
+        "b.symbol_searcher; b.weight_limiter; done = time.perf_counter(); "
+        "print(pandas_done - start, import_done - pandas_done, done - import_done)"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EXCHANGE_INFO_CACHE
+        if not (os.path.exists(cache) and time.time() - os.path.getmtime(cache) < EXCHANGE_INFO_TTL):
+            cache = os.path.join(directory, 'exchange_info.pkl')
+            filters = [{'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000.00', 'tickSize': '0.01'},
+                       {'filterType': 'LOT_SIZE', 'minQty': '0.00001', 'maxQty': '9000.0', 'stepSize': '0.00001'}]
+            info = {
+                'rateLimits': [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 6000}],
+                'symbols': [{'symbol': f'S{k}USDT', 'status': 'TRADING', 'baseAsset': f'S{k}', 'quoteAsset': 'USDT',
+                             'quotePrecision': 8, 'isSpotTradingAllowed': True, 'isMarginTradingAllowed': k % 3 == 0,
+                             'orderTypes': ['LIMIT', 'MARKET'], 'permissions': ['SPOT'], 'filters': filters * 5}
+                            for k in range(3000)],
+            }
+            with open(cache, 'wb') as f:
+                pickle.dump(info, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        env = {**os.environ, 'BINANCE_EXCHANGE_INFO_CACHE': cache, 'PYTHONPATH': project_root}
+        runs = [
+            [float(x) for x in subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout.split()]
+            for _ in range(5)
+        ]
+    pandas_seconds, import_seconds, bootstrap_seconds = (min(column) for column in zip(*runs))
+    print(f"import pandas {pandas_seconds * 1000:.0f}ms (shared by any notebook), "
+          f"import src.data.binance +{import_seconds * 1000:.1f}ms, "
+          f"symbol_searcher + weight_limiter from the warm cache +{bootstrap_seconds * 1000:.1f}ms")
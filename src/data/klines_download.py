@@ -0,0 +1,330 @@
+from typing import Literal, List, Tuple, Callable, Dict
+from datetime import datetime
+import asyncio
+import aiohttp
+import pandas as pd
+import time
+
+KLINE_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+    'quote_volume', 'count', 'taker_buy_volume', 'taker_buy_quote_volume', 'ignore'
+]
+
+INTERVAL_MS = {
+    '1s': 1_000, '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000, '8h': 28_800_000,
+    '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000, '1w': 604_800_000, '1M': 2_678_400_000,
+}
+
+
+class WeightBudget:
+    """
+    Asyncio counterpart of `RateLimitFactory`: request weight per fixed window, shared by every task.
+
+    Windows are aligned to the clock like the exchange's (e.g. calendar minutes), and the used weight is
+    corrected from the server's `X-MBX-USED-WEIGHT-*` header after every response, so weight spent by
+    other clients on the same IP is accounted for. A 429 / 418 pauses every task for its Retry-After.
+    Waiters are served first come first served.
+    """
+
+    def __init__(self, limit: int, interval: int = 60, headroom: float = 0.9):
+        """
+        Args:
+            limit: weight per window, e.g. `weight_limiter.limit`
+            interval: window in seconds, e.g. `weight_limiter.interval`
+            headroom: fraction of the limit this process may use
+        """
+        self.limit = int(limit * headroom)
+        self.interval = interval
+        self.used = 0
+        self.window = None
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    def __repr__(self):
+        return f"WeightBudget {self.used}/{self.limit} per {self.interval}s"
+
+    def _roll(self, now: float):
+        window = int(now // self.interval)
+        if window != self.window:
+            self.window = window
+            self.used = 0
+
+    async def acquire(self, weight: int):
+        """Wait until `weight` fits in the current window, then spend it"""
+        async with self._lock:
+            while True:
+                now = time.time()
+                self._roll(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.used + weight <= self.limit:
+                    self.used += weight
+                    return
+                else:
+                    delay = (self.window + 1) * self.interval - now
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def observe(self, used_weight: int):
+        """Server-side used weight of the current window"""
+        self._roll(time.time())
+        self.used = max(self.used, used_weight)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+
+def kline_chunks(symbols: List[str],
+                 interval: str,
+                 start: datetime,
+                 end: datetime,
+                 limit: int = 1000) -> List[Tuple[str, int, int, int]]:
+    """
+    (symbol, sequence, startTime, endTime) requests of at most `limit` klines covering [start, end),
+    symbol by symbol in time order
+    """
+    step = INTERVAL_MS[interval] * limit
+    start_ms, end_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+    return [
+        (symbol, n, chunk_start, min(chunk_start + step, end_ms) - 1)  # -1: endTime is inclusive
+        for symbol in symbols
+        for n, chunk_start in enumerate(range(start_ms, end_ms, step))
+    ]
+
+
+class _OrderedWriter:
+    """Hands each symbol's chunks to `write` in sequence order, holding back early arrivals"""
+
+    def __init__(self, write: Callable[[str, pd.DataFrame], None]):
+        self.write = write
+        self.next: Dict[str, int] = {}
+        self.pending: Dict[Tuple[str, int], pd.DataFrame] = {}
+        self.held = 0  # Most chunks ever held back at once
+
+    def put(self, symbol: str, sequence: int, frame: pd.DataFrame):
+        self.pending[symbol, sequence] = frame
+        self.held = max(self.held, len(self.pending))
+        n = self.next.get(symbol, 0)
+        while (symbol, n) in self.pending:
+            self.write(symbol, self.pending.pop((symbol, n)))
+            n += 1
+        self.next[symbol] = n
+
+
+async def _fetch(session: aiohttp.ClientSession,
+                 budget: WeightBudget,
+                 url: str,
+                 params: dict,
+                 weight: int,
+                 retries: int) -> list:
+    """One request. Server errors and dropped connections use up `retries`; rate limits do not"""
+    attempt = 0
+    while True:
+        await budget.acquire(weight)
+        try:
+            async with session.get(url, params=params) as r:
+                for header, value in r.headers.items():
+                    if header.upper().startswith('X-MBX-USED-WEIGHT-'):
+                        budget.observe(int(value))
+                        break
+                if r.status == 200:
+                    return await r.json()
+                if r.status in (418, 429):
+                    # Rate limited: the budget waits out Retry-After, the request itself did not fail
+                    budget.pause(float(r.headers.get('Retry-After', budget.interval)))
+                    continue
+                if r.status < 500:
+                    raise Exception(f'Error: {r.status} {await r.text()}')
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        else:
+            if attempt == retries:
+                raise Exception(f'Error: gave up on {params} after {retries} retries')
+        await asyncio.sleep(min(2 ** attempt * 0.5, 30))
+        attempt += 1
+
+
+async def download_klines_async(symbols: List[str],
+                                interval: Literal['1s', '1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w', '1M'],
+                                start: datetime,
+                                end: datetime,
+                                write: Callable[[str, pd.DataFrame], None],
+                                weight_limit: int = 6000,
+                                weight_interval: int = 60,
+                                request_weight: int = 2,
+                                max_in_flight: int = 64,
+                                time_zone: str = '9',
+                                base_url: str = 'https://api.binance.com',
+                                retries: int = 5) -> dict:
+    """
+    Klines of many symbols over [start, end), fetched concurrently and written in order.
+
+    The range is cut into `kline_chunks` of 1000 klines. Tasks take chunks in order and each request
+    first waits on the shared `WeightBudget`, so the request rate follows the weight budget: with
+    budget to spare up to `max_in_flight` requests are open at once (a bound on connections and
+    memory, not the pacing), and once the window's weight is spent every task waits for the next one.
+    Responses may complete out of order; each symbol's chunks are passed to `write(symbol, frame)` in
+    time order, early ones held back until the gap is filled. A request that fails for good cancels
+    the other tasks and its exception is raised.
+
+    Returns:
+        dict: requests, klines, seconds, seconds waited on the budget, most chunks held back
+    """
+    chunks = kline_chunks(symbols, interval, start, end)
+    budget = WeightBudget(weight_limit, weight_interval)
+    writer = _OrderedWriter(write)
+    queue = iter(chunks)
+    url = f'{base_url}/api/v3/klines'
+    klines = 0
+    start_time = time.perf_counter()
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal klines
+        for symbol, sequence, chunk_start, chunk_end in queue:
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': chunk_start,
+                'endTime': chunk_end,
+                'timeZone': time_zone,
+                'limit': 1000,
+            }
+            data = await _fetch(session, budget, url, params, request_weight, retries)
+            klines += len(data)
+            writer.put(symbol, sequence, pd.DataFrame(data, columns=KLINE_COLUMNS))
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        try:
+            # A failing task cancels its siblings instead of leaving them to drain the queue
+            async with asyncio.TaskGroup() as group:
+                for _ in range(min(max_in_flight, len(chunks))):
+                    group.create_task(worker(session))
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+
+    return {
+        'requests': len(chunks),
+        'klines': klines,
+        'seconds': time.perf_counter() - start_time,
+        'waited': budget.waited,
+        'held_back': writer.held,
+    }
+
+
+def download_klines(symbols: List[str],
+                    interval: Literal['1s', '1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w', '1M'],
+                    start: datetime,
+                    end: datetime,
+                    write: Callable[[str, pd.DataFrame], None] | None = None,
+                    **kwargs) -> Dict[str, pd.DataFrame] | dict:
+    """
+    Blocking wrapper of `download_klines_async`. Without `write`, returns {symbol: klines} with the
+    `BinanceHistory.klines` columns (in a running event loop, e.g. Jupyter, await the async version)
+    """
+    if write is not None:
+        return asyncio.run(download_klines_async(symbols, interval, start, end, write, **kwargs))
+
+    frames: Dict[str, List[pd.DataFrame]] = {symbol: [] for symbol in symbols}
+    asyncio.run(download_klines_async(symbols, interval, start, end, lambda symbol, frame: frames[symbol].append(frame), **kwargs))
+    return {
+        symbol: pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=KLINE_COLUMNS)
+        for symbol, parts in frames.items()
+    }
+
+
+if __name__ == "__main__":
+    # Local mock of the klines endpoint: deterministic klines, random latency, per-window weight
+    # accounting with X-MBX-USED-WEIGHT-1M headers and 429 + Retry-After beyond the limit
+    import random
+    import socket
+    from aiohttp import web
+
+    WINDOW, LIMIT, LATENCY = 2, 400, (0.005, 0.05)
+    server_state = {'window': None, 'used': 0, 'requests': 0, 'rejected': 0, 'max_used': 0, 'external': 0}
+
+    def mock_kline(symbol: str, open_time: int, interval_ms: int) -> list:
+        price = 100 + (hash(symbol) % 50) + (open_time // interval_ms) % 97 * 0.01
+        return [open_time, f"{price:.2f}", f"{price + 0.05:.2f}", f"{price - 0.05:.2f}", f"{price:.2f}", "1.0",
+                open_time + interval_ms - 1, f"{price:.2f}", 3, "0.5", f"{price / 2:.2f}", "0"]
+
+    async def klines_handler(request: web.Request) -> web.Response:
+        window = int(time.time() // WINDOW)
+        if window != server_state['window']:
+            # 'external': weight spent in every window by another client on the same IP
+            server_state['window'], server_state['used'] = window, server_state['external']
+        server_state['used'] += 2
+        server_state['requests'] += 1
+        server_state['max_used'] = max(server_state['max_used'], server_state['used'])
+        headers = {'X-MBX-USED-WEIGHT-1M': str(server_state['used'])}
+        if server_state['used'] > LIMIT:
+            server_state['rejected'] += 1
+            return web.Response(status=429, headers={**headers, 'Retry-After': str(WINDOW)})
+
+        await asyncio.sleep(random.uniform(*LATENCY))
+        q = request.query
+        if q['symbol'].startswith('BAD'):
+            return web.Response(status=400, text='{"code":-1121,"msg":"Invalid symbol."}', headers=headers)
+        interval_ms = INTERVAL_MS[q['interval']]
+        first = -(-int(q['startTime']) // interval_ms) * interval_ms
+        times = range(first, int(q['endTime']) + 1, interval_ms)[:int(q['limit'])]
+        return web.json_response([mock_kline(q['symbol'], t, interval_ms) for t in times], headers=headers)
+
+    async def main(weight_limit: int, retries: int = 5, symbols: List[str] | None = None):
+        app = web.Application()
+        app.router.add_get('/api/v3/klines', klines_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        site = web.TCPSite(runner, '127.0.0.1', port)
+        await site.start()
+
+        symbols = symbols or [f"SYM{k}USDT" for k in range(12)]
+        start, end = datetime(2024, 1, 1), datetime(2024, 1, 15)
+        written: Dict[str, List[pd.DataFrame]] = {symbol: [] for symbol in symbols}
+        try:
+            report = await download_klines_async(symbols, '1m', start, end, lambda symbol, frame: written[symbol].append(frame),
+                                                 weight_limit=weight_limit, weight_interval=WINDOW, max_in_flight=32,
+                                                 base_url=f'http://127.0.0.1:{port}', retries=retries)
+        finally:
+            await runner.cleanup()
+        return symbols, start, end, written, report
+
+    def check(symbols, start, end, written):
+        expected_times = list(range(int(start.timestamp() * 1000), int(end.timestamp() * 1000), 60_000))
+        for symbol in symbols:
+            frame = pd.concat(written[symbol], ignore_index=True)
+            # Complete, in order, no duplicates, right content
+            assert frame['timestamp'].tolist() == expected_times, symbol
+            assert frame.iloc[123].tolist() == mock_kline(symbol, expected_times[123], 60_000)
+
+    symbols, start, end, written, report = asyncio.run(main(LIMIT))
+    check(symbols, start, end, written)
+    assert server_state['rejected'] == 0, server_state
+    print(f"OK - {report['requests']} requests, {report['klines']} klines in {report['seconds']:.2f}s "
+          f"({report['requests'] / report['seconds']:.0f} req/s against a budget of {LIMIT * 0.9 / 2 / WINDOW:.0f} req/s); "
+          f"waited {report['waited']:.1f}s on the budget, at most {report['held_back']} chunks held back, "
+          f"server peak weight {server_state['max_used']}/{LIMIT}, 0 rejected")
+
+    # Another client on the IP and a budget above the server's limit: 429s are retried after Retry-After,
+    # without using up retries (none allowed here)
+    server_state.update(requests=0, rejected=0, external=300)
+    symbols, start, end, written, report = asyncio.run(main(LIMIT * 3, retries=0))
+    check(symbols, start, end, written)
+    assert server_state['rejected'] > 0
+    print(f"OK - overcommitted budget: {server_state['rejected']} requests rejected and retried, data complete and in order")
+
+    # A request failing for good stops the download: the other tasks are cancelled, not drained
+    server_state.update(requests=0, rejected=0, external=0)
+    try:
+        asyncio.run(main(LIMIT, symbols=["BADUSDT"] + [f"SYM{k}USDT" for k in range(12)]))
+        raise AssertionError("failed request not raised")
+    except Exception as e:
+        assert '400' in str(e), e
+    assert server_state['requests'] < len(kline_chunks([f"SYM{k}USDT" for k in range(13)], '1m', start, end)) // 2, server_state
+    print(f"OK - failed request raised, download stopped after {server_state['requests']} requests")
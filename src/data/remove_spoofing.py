@@ -1,22 +1,76 @@
 import pandas as pd
-from typing import Literal
+import numpy as np
+from typing import Literal, List, Tuple
+from collections import deque
 
 def detect_spoofing(price_series: pd.Series, volume_series: pd.Series, slack: int =1):
     """
     Detect potential spoofing patterns in volume changes
     
+    A volume change is spoofed when the opposite change (-diff) shows up at the same price
+    within `slack` seconds after it; both ends are reported. Changes are grouped by (price, diff),
+    and every change looks up its (price, -diff) group's time window with one searchsorted over
+    sorted (group, time) keys, so the whole detection is O(n log n).
+
     Args:
+        price_series: pandas Series with price data
         volume_series: pandas Series with volume data
         slack: time window in seconds to look for matching opposite changes
         
     Returns:
-        set: indices of detected spoofing instances
+        pd.DataFrame: `spoofed` flag indexed by the timestamps of detected spoofing instances
     """
     diff = volume_series.diff()
     
     diff_df = pd.DataFrame({"price": price_series, "diff": diff})
     diff_df = diff_df[diff_df['diff'] != 0].dropna()
 
+    n = len(diff_df)
+    times = diff_df.index.asi8
+    slack_units = pd.Timedelta(seconds=slack) // pd.Timedelta(1, unit=diff_df.index.unit) if n else 0
+    price = diff_df['price'].to_numpy()
+    change = diff_df['diff'].to_numpy()
+
+    # Group by (price, diff) and find the (price, -diff) group of every change
+    codes, groups = pd.MultiIndex.from_arrays([price, change]).factorize()
+    opposite = groups.get_indexer(pd.MultiIndex.from_arrays([price, -change]))
+
+    # Sorted (group, time rank) keys, flattened into one int64
+    unique_times = np.unique(times)
+    stride = len(unique_times) + 1
+    keys = codes * stride + np.searchsorted(unique_times, times, side='left')
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # Matches of change i: its opposite group, times in (t_i, t_i + slack]
+    lo_rank = np.searchsorted(unique_times, times, side='right')
+    hi_rank = np.searchsorted(unique_times, times + slack_units, side='right')
+    lo = np.searchsorted(sorted_keys, opposite * stride + lo_rank, side='left')
+    hi = np.searchsorted(sorted_keys, opposite * stride + hi_rank, side='left')
+    matched = (opposite >= 0) & (hi > lo)
+
+    # Mark every matching change with a difference array over the sorted positions
+    cover = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(cover, lo[matched], 1)
+    np.add.at(cover, hi[matched], -1)
+    spoofed = matched.copy()
+    spoofed[order] |= np.cumsum(cover[:-1]) > 0
+
+    spoofing = pd.DataFrame(index=diff_df.index[spoofed].unique() if spoofed.any() else [])
+    spoofing["spoofed"] = [True] * len(spoofing)
+    spoofing.sort_index(inplace=True)
+    spoofing.index.name = "timestamp"
+
+    return spoofing
+
+
+def _detect_spoofing_naive(price_series: pd.Series, volume_series: pd.Series, slack: int =1):
+    """Reference O(n^2) implementation of `detect_spoofing`, kept for equivalence checks"""
+    diff = volume_series.diff()
+    
+    diff_df = pd.DataFrame({"price": price_series, "diff": diff})
+    diff_df = diff_df[diff_df['diff'] != 0].dropna()
+
     spoofing_log = set()
 
     for idx, row in diff_df.iterrows():
@@ -43,4 +97,216 @@ def detect_spoofing(price_series: pd.Series, volume_series: pd.Series, slack: in
     spoofing.sort_index(inplace=True)
     spoofing.index.name = "timestamp"
 
-    return spoofing
\ No newline at end of file
+    return spoofing
+
+
+
+def _paired_changes(times: np.ndarray, keys: np.ndarray, diffs: np.ndarray, slack_units: int) -> np.ndarray:
+    """
+    One-to-one spoof pairs: in time order, a change pairs with the oldest unpaired earlier change
+    with the same key and the opposite diff at most `slack_units` before it. Returns the paired mask
+    """
+    paired = np.zeros(len(times), dtype=bool)
+    unpaired = dict()  # (key, diff) -> (time, position) of unpaired changes, oldest first
+    for k, (t, key, diff) in enumerate(zip(times.tolist(), keys.tolist(), diffs.tolist())):
+        candidates = unpaired.get((key, -diff))
+        if candidates:
+            while candidates and candidates[0][0] < t - slack_units:
+                candidates.popleft()
+            if candidates and candidates[0][0] < t:
+                paired[candidates.popleft()[1]] = paired[k] = True
+                continue
+        unpaired.setdefault((key, diff), deque()).append((t, k))
+    return paired
+
+
+def non_spoofed_volume(price_series: pd.Series, volume_series: pd.Series, slack: int = 1) -> pd.Series:
+    """
+    Remove spoofed volume changes from a volume series.
+
+    Volume belongs to a price level: a run of ticks at the same price. Within a level, a change and
+    the opposite change that follows it within `slack` seconds (the pattern `detect_spoofing`
+    reports) form a spoof pair: an order placed and pulled, or pulled and put back. Pairs are matched
+    one to one - a change pairs with the oldest unpaired opposite change before it - and both ends
+    are taken out of the level's running volume, so the pair leaves no trace while the unrelated
+    volume is untouched. The change across a level move is not an order at either level and never
+    pairs. Should a pair's placement be partly consumed by a genuine decrease before it is pulled,
+    the cleaned volume is floored at 0. This is how the `non_spoofed_best_bid_volume` /
+    `non_spoofed_best_ask_volume` columns of the bar builders are derived, one book side at a time.
+
+    Returns:
+        pd.Series: cleaned volume, same index as `volume_series`
+    """
+    level = (price_series != price_series.shift()).cumsum()
+    diff = volume_series.diff()
+    changed = ((diff != 0) & diff.notna() & (level == level.shift())).to_numpy()
+    slack_units = pd.Timedelta(seconds=slack) // pd.Timedelta(1, unit=volume_series.index.unit)
+
+    paired = np.zeros(len(volume_series), dtype=bool)
+    paired[changed] = _paired_changes(volume_series.index.asi8[changed], level.to_numpy()[changed],
+                                      diff.to_numpy()[changed], slack_units)
+    return (volume_series - diff.where(paired, 0).groupby(level).cumsum()).clip(lower=0)
+
+
+class _SpoofSide:
+    """Online spoof pairing (as `non_spoofed_volume`) of one book side, bounded to the last `slack` seconds"""
+    def __init__(self, slack_ns: int):
+        self.slack_ns = slack_ns
+        self.last_volume = np.nan
+        self.last_price = np.nan
+        self.segment = 0  # Number of the current price level (run of ticks at one price)
+        self.window = deque()  # [time, level number, diff, paired] of recent changes, oldest first
+        self.unpaired = dict()  # (level number, diff) -> recent unpaired changes, oldest first
+        self.level = np.nan  # Price level of the last emitted tick
+        self.offset = 0.0  # Paired volume emitted at that level so far
+
+    def change(self, t: int, price: float, volume: float) -> list | None:
+        """Register a tick. Returns its volume change record, or None if the volume did not change"""
+        diff = volume - self.last_volume
+        self.last_volume = volume
+        crossing = price != self.last_price
+        self.last_price = price
+        if crossing:
+            self.segment += 1
+        if np.isnan(diff) or diff == 0:
+            return None  # First tick (NaN) or no change
+        if crossing:
+            return [t, self.segment, diff, False]  # Change across levels: never paired
+
+        # Drop changes that can no longer pair: t - slack <= t_old
+        while self.window and self.window[0][0] < t - self.slack_ns:
+            old = self.window.popleft()
+            if not old[3]:
+                same_key = self.unpaired[(old[1], old[2])]
+                same_key.popleft()
+                if not same_key:
+                    del self.unpaired[(old[1], old[2])]
+
+        record = [t, self.segment, diff, False]
+        self.window.append(record)
+        candidates = self.unpaired.get((self.segment, -diff))
+        if candidates and candidates[0][0] < t:
+            old = candidates.popleft()
+            if not candidates:
+                del self.unpaired[(self.segment, -diff)]
+            old[3] = record[3] = True
+        else:
+            self.unpaired.setdefault((self.segment, diff), deque()).append(record)
+        return record
+
+    def clean(self, price: float, volume: float, record: list | None) -> float:
+        """Cleaned volume of an emitted tick. `record` is final once `slack` seconds have passed"""
+        if price != self.level:
+            # New price level: nothing removed yet, and the change into it is not an order at it
+            self.level = price
+            self.offset = 0.0
+        elif record is not None and record[3]:
+            self.offset += record[2]
+        return max(volume - self.offset, 0.0)
+
+
+class StreamingSpoofFilter:
+    """
+    Online spoof filter producing `non_spoofed_best_bid_volume` / `non_spoofed_best_ask_volume`.
+
+    Takes raw best bid / ask ticks and emits cleaned ticks with a fixed latency of `slack` seconds:
+    a tick is released as soon as a tick more than `slack` seconds newer arrives, because only then
+    no later opposite change can pair with it. Memory is bounded by the ticks of the last `slack` seconds.
+
+    The output equals `non_spoofed_volume` on each side.
+    The emitted (timestamp, price, bid_volume, ask_volume) tuples feed
+    `OrderbookImbalanceBarBuilder.update_tick` directly.
+    """
+    def __init__(self, slack: int = 1):
+        self.slack = slack
+        slack_ns = pd.Timedelta(seconds=slack).value
+        self.bid = _SpoofSide(slack_ns)
+        self.ask = _SpoofSide(slack_ns)
+        self.pending = deque()  # (time, timestamp, price, bid_price, bid_volume, bid_record, ask_price, ask_volume, ask_record)
+
+    def __repr__(self):
+        return f"StreamingSpoofFilter(slack {self.slack}s, {len(self.pending)} ticks pending)"
+
+    def update(self,
+               timestamp: pd.Timestamp,
+               price: float,
+               best_bid_price: float,
+               best_bid_volume: float,
+               best_ask_price: float,
+               best_ask_volume: float) -> List[Tuple[pd.Timestamp, float, float, float]]:
+        """
+        Consume one raw tick.
+
+        Returns:
+            list: (timestamp, price, non_spoofed_best_bid_volume, non_spoofed_best_ask_volume)
+                  of the ticks released by this one, oldest first
+        """
+        t = pd.Timestamp(timestamp).value
+        released = self._release(t - self.bid.slack_ns)
+        self.pending.append((
+            t, timestamp, price,
+            best_bid_price, best_bid_volume, self.bid.change(t, best_bid_price, best_bid_volume),
+            best_ask_price, best_ask_volume, self.ask.change(t, best_ask_price, best_ask_volume),
+        ))
+        return released
+
+    def flush(self) -> List[Tuple[pd.Timestamp, float, float, float]]:
+        """Release every pending tick (end of the stream)"""
+        return self._release(None)
+
+    def _release(self, before: int | None) -> list:
+        released = []
+        while self.pending and (before is None or self.pending[0][0] < before):
+            _, timestamp, price, bid_price, bid_volume, bid_record, ask_price, ask_volume, ask_record = self.pending.popleft()
+            released.append((
+                timestamp, price,
+                self.bid.clean(bid_price, bid_volume, bid_record),
+                self.ask.clean(ask_price, ask_volume, ask_record),
+            ))
+        return released
+
+if __name__ == "__main__":
+    import time
+
+    def synthetic_orderbook(n: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        index = pd.Timestamp("2025-03-09") + pd.to_timedelta(np.sort(rng.integers(0, n // 4 + 1, n)), unit="s")
+        price = pd.Series(100 + rng.integers(0, 5, n) * 0.01, index=index)
+        volume = pd.Series(rng.choice([1.0, 2.0, 3.0, 5.0, 8.0], n), index=index)
+        return price, volume
+
+    # Equivalence check against the O(n^2) reference
+    for seed in range(3):
+        price, volume = synthetic_orderbook(3000, seed)
+        expected = _detect_spoofing_naive(price, volume, slack=2)
+        result = detect_spoofing(price, volume, slack=2)
+        pd.testing.assert_frame_equal(expected, result)
+    print(f"OK - {len(result)} spoofed timestamps match")
+
+    # Streaming filter against the batch cleaning, on a book whose price levels move
+    rng = np.random.default_rng(0)
+    index = pd.Timestamp("2025-03-09") + pd.to_timedelta(np.cumsum(rng.integers(1, 800, 20_000)), unit="ms")
+    bid_price = pd.Series(100 + np.cumsum(rng.choice([-1, 0, 0, 0, 1], len(index))) * 0.01, index=index)
+    ask_price = bid_price + 0.01 * rng.integers(1, 3, len(index))
+    bid_volume = pd.Series(rng.choice([1.0, 2.0, 3.0, 5.0, 8.0], len(index)), index=index)
+    ask_volume = pd.Series(rng.choice([1.0, 2.0, 3.0, 5.0, 8.0], len(index)), index=index)
+    spoof_filter = StreamingSpoofFilter(slack=1)
+    streamed = []
+    for tick in zip(index, bid_price, bid_price, bid_volume, ask_price, ask_volume):
+        streamed += spoof_filter.update(*tick)
+    streamed = pd.DataFrame(streamed + spoof_filter.flush(),
+                            columns=['timestamp', 'price', 'bid', 'ask']).set_index('timestamp')
+    expected_bid = non_spoofed_volume(bid_price, bid_volume, slack=1)
+    expected_ask = non_spoofed_volume(ask_price, ask_volume, slack=1)
+    np.testing.assert_array_equal(streamed['bid'].to_numpy(), expected_bid.to_numpy())
+    np.testing.assert_array_equal(streamed['ask'].to_numpy(), expected_ask.to_numpy())
+    assert (expected_bid >= 0).all() and (expected_ask >= 0).all()
+    print(f"OK - streaming filter matches non_spoofed_volume on {len(index)} ticks, "
+          f"{(expected_bid != bid_volume).sum()} bid / {(expected_ask != ask_volume).sum()} ask cleaned")
+
+    # Benchmark
+    for n in (10 ** 5, 10 ** 6, 10 ** 7):
+        price, volume = synthetic_orderbook(n)
+        start_time = time.perf_counter()
+        result = detect_spoofing(price, volume, slack=1)
+        print(f"{n:>10} changes: {time.perf_counter() - start_time:.2f}s ({len(result)} spoofed)")
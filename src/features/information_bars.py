@@ -1,7 +1,9 @@
 import pandas as pd
+import numpy as np
 
-from typing import TypedDict, List
+from typing import TypedDict, List, Literal, Tuple
 from collections import deque
+import copy
 
 
 class OrderbookImbalanceBar(TypedDict, total=False):
@@ -90,6 +92,7 @@ def orderbook_imbalance_information_bar(df: pd.DataFrame,
 
         if (price == previous_price) and (bid_vol == previous_bid_vol) and (ask_vol == previous_ask_vol):
             continue  # No changes in price, bid volume or ask volume. No information given.
+        previous_price, previous_bid_vol, previous_ask_vol = price, bid_vol, ask_vol
 
         # Build the curreent bar
         if current_bar.get('start_time', pd.Timestamp.min) == pd.Timestamp.min:
@@ -139,7 +142,822 @@ def orderbook_imbalance_information_bar(df: pd.DataFrame,
         # Append the last bar - in progress
         print("appending the last bar - in progress", bar_id)
         current_bar['id'] = bar_id
-        current_bar['imbalance_path'] = pd.Series(imbalance_path).cumsum().tolist()
+        current_bar['imbalance_path'] = [
+            imbalance_path_time,
+            pd.Series(imbalance_path, dtype=float).cumsum().tolist()
+        ]
         bars.append(current_bar)
 
-    return pd.DataFrame(bars)
\ No newline at end of file
+    return pd.DataFrame(bars)
+
+def _changed_tick_mask(price: np.ndarray,
+                       bid_vol: np.ndarray,
+                       ask_vol: np.ndarray,
+                       previous: tuple) -> np.ndarray:
+    """
+    Vectorized version of the "no changes, no information" filter.
+
+    Args:
+        price, bid_vol, ask_vol: tick arrays
+        previous: (price, bid_vol, ask_vol) of the tick right before the first element
+
+    Returns:
+        np.ndarray: boolean mask of the ticks that changed price, bid or ask volume
+    """
+    prev_price = np.concatenate(([previous[0]], price[:-1]))
+    prev_bid_vol = np.concatenate(([previous[1]], bid_vol[:-1]))
+    prev_ask_vol = np.concatenate(([previous[2]], ask_vol[:-1]))
+    return (price != prev_price) | (bid_vol != prev_bid_vol) | (ask_vol != prev_ask_vol)
+
+
+def _scan_imbalance(imbalance: np.ndarray,
+                    start: int,
+                    threshold: float,
+                    carry: float = 0.0,
+                    window: int = 64) -> tuple:
+    """
+    Find the first tick from `start` whose running imbalance crosses the threshold.
+
+    The running imbalance is accumulated with np.cumsum in growing windows, continuing
+    from `carry`. The additions happen in the same order as the tick-by-tick loop,
+    so the bar boundaries are bit-identical.
+
+    Returns:
+        (close index or -1 if the threshold is never crossed, running imbalance path)
+    """
+    n = len(imbalance)
+    chunks = []
+    pos = start
+    while pos < n:
+        end = min(pos + window, n)
+        cum = np.cumsum(np.concatenate(([carry], imbalance[pos:end])))[1:]
+        crossed = np.abs(cum) > threshold
+        if crossed.any():
+            k = int(crossed.argmax())
+            chunks.append(cum[:k + 1])
+            return pos + k, np.concatenate(chunks)
+        chunks.append(cum)
+        carry = cum[-1]
+        pos = end
+        window *= 2
+
+    return -1, np.concatenate(chunks) if chunks else np.empty(0)
+
+
+# Column order of the bar table returned by `orderbook_imbalance_information_bar`
+_BAR_COLUMNS = [
+    'id', 'start_time', 'end_time', 'open', 'high', 'low', 'close',
+    'row_count', 'imbalance_path', 'cumulative_imbalance', 'threshold'
+]
+
+
+class ImbalancePaths:
+    """
+    Imbalance paths of many bars in Arrow-style ragged layout.
+
+    Bar i owns `times[offsets[i]:offsets[i + 1]]` (int64 in `unit`, UTC if `tz` is set)
+    and the same slice of `values` (cumulative imbalance). Three flat arrays replace
+    one pair of Python lists per bar, and the accessors return views instead of copies.
+    """
+    def __init__(self, times: np.ndarray, values: np.ndarray, offsets: np.ndarray, unit: str = 'ns', tz: str = ''):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.unit = unit
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return f"ImbalancePaths({len(self)} bars, {len(self.values)} ticks, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes + self.offsets.nbytes
+
+    def path(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy (times, cumulative imbalance) views of bar i"""
+        i = range(len(self))[i]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.times[start:end], self.values[start:end]
+
+    def time_index(self, i: int) -> pd.DatetimeIndex:
+        """Timestamps of bar i as a DatetimeIndex"""
+        times, _ = self.path(i)
+        index = pd.DatetimeIndex(times.view(f'M8[{self.unit}]'), copy=False)
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+
+    def series(self, i: int) -> pd.Series:
+        """Imbalance path of bar i as a Series indexed by time"""
+        _, values = self.path(i)
+        return pd.Series(values, index=self.time_index(i), copy=False)
+
+    def to_lists(self) -> list:
+        """Legacy `imbalance_path` format: [[Timestamp, ...], [float, ...]] per bar"""
+        index = pd.DatetimeIndex(self.times.view(f'M8[{self.unit}]'), copy=False)
+        index = index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+        return [
+            [index[start:end].tolist(), self.values[start:end].tolist()]
+            for start, end in zip(self.offsets[:-1], self.offsets[1:])
+        ]
+
+    @classmethod
+    def concat(cls, parts: List["ImbalancePaths"]) -> "ImbalancePaths":
+        """Join the paths of consecutive bar tables"""
+        sizes = [len(p.times) for p in parts]
+        shifts = np.cumsum([0] + sizes[:-1])
+        offsets = [parts[0].offsets[:1]] + [p.offsets[1:] + shift for p, shift in zip(parts, shifts)]
+        return cls(
+            np.concatenate([p.times for p in parts]),
+            np.concatenate([p.values for p in parts]),
+            np.concatenate(offsets),
+            parts[0].unit,
+            parts[0].tz,
+        )
+
+
+class OrderbookImbalanceBarBuilder:
+    """
+    Incremental version of `orderbook_imbalance_information_bar`.
+
+    Feed ticks in time order with `update` (tick batches) or `update_tick` (single ticks).
+    Only completed bars are returned; `flush` reports the in-progress bar without consuming it.
+    The whole state - genesis buffer, `b_t` / `tsize_t` EWMA state, threshold history and
+    the in-progress bar - is exported with `state_dict` / `save` and restored with
+    `from_state_dict` / `load`, so a later run can resume where the last one stopped.
+
+    Concatenating every `update` output with the final `flush` gives the same table as a
+    single batch run over the concatenated ticks.
+
+    With `path_storage='ragged'` the bar tables have no `imbalance_path` column; every
+    output is a `(bars, ImbalancePaths)` tuple instead, joined with `ImbalancePaths.concat`.
+    """
+    def __init__(self,
+                 initial_collection: int,
+                 b_t_ewma: float,
+                 tsize_t_ewma: float,
+                 historical_threshold_limit: float = 0.2,
+                 historical_threshold_collection: int = 100,
+                 path_storage: Literal['list', 'ragged'] = 'list'):
+        self.initial_collection = initial_collection
+        self.b_t_ewma = b_t_ewma
+        self.tsize_t_ewma = tsize_t_ewma
+        self.historical_threshold_limit = historical_threshold_limit
+        self.historical_threshold_collection = historical_threshold_collection
+        self.path_storage = path_storage
+
+        # Time representation, fixed by the first tick. Times are kept as int64 in `unit`
+        self.unit = ''
+        self.tz = ''
+        self.last_time = 0
+
+        # Genesis
+        self.genesis_done = False
+        self.genesis_start = 0
+        self.genesis_end = 0
+        self.genesis_ticks = [np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)]
+
+        # Threshold state
+        self.b_t = 0.0
+        self.tsize_t = 0.0
+        self.threshold_t = 0.0
+        self.historical_threshold = deque(maxlen=historical_threshold_collection)
+        self.bar_id = 0
+        self.previous = (np.nan, np.nan, np.nan)  # (price, bid_vol, ask_vol) of the last tick
+
+        # In-progress bar
+        self.bar_times: List[int] = []
+        self.bar_prices: List[float] = []
+        self.bar_path: List[float] = []
+
+    def __repr__(self):
+        return f"OrderbookImbalanceBarBuilder(next bar {self.bar_id}, threshold {self.threshold_t}, in progress {len(self.bar_times)} ticks)"
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths]:
+        """Consume a batch of ticks and return the bars it completed"""
+        if df.empty:
+            return self._output(self._empty())
+
+        times, price, bid_vol, ask_vol = self._ticks(df)
+        if self.genesis_done:
+            return self._output(self._process(times, price, bid_vol, ask_vol))
+
+        self.genesis_ticks = [np.concatenate((old, new)) for old, new in zip(self.genesis_ticks, (times, price, bid_vol, ask_vol))]
+        if self.genesis_ticks[0][-1] <= self.genesis_end:
+            return self._output(self._empty())
+        return self._output(self._close_genesis())
+
+    def update_tick(self, timestamp: pd.Timestamp, price: float, bid_vol: float, ask_vol: float) -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths] | None:
+        """Consume a single tick. Returns the completed bars, or None if no bar was closed"""
+        price, bid_vol, ask_vol = float(price), float(bid_vol), float(ask_vol)
+        if self.genesis_done:
+            # Fast path: the tick carries no information or does not close the bar
+            t = int(pd.Timestamp(timestamp).as_unit(self.unit).asm8.view(np.int64))
+            if t < self.last_time:
+                raise ValueError(f"Tick {timestamp} arrived out of order")
+
+            if price == self.previous[0] and bid_vol == self.previous[1] and ask_vol == self.previous[2]:
+                self.last_time = t
+                return None
+
+            imbalance = bid_vol - ask_vol
+            cumulative_imbalance = (self.bar_path[-1] if self.bar_path else 0.0) + imbalance
+            if abs(cumulative_imbalance) <= self.threshold_t:
+                self.last_time = t
+                self.previous = (price, bid_vol, ask_vol)
+                self.bar_times.append(t)
+                self.bar_prices.append(price)
+                self.bar_path.append(cumulative_imbalance)
+                return None
+
+        output = self.update(pd.DataFrame({
+            'price': [price],
+            'non_spoofed_best_bid_volume': [bid_vol],
+            'non_spoofed_best_ask_volume': [ask_vol],
+        }, index=pd.DatetimeIndex([timestamp])))
+        bars = output[0] if self.path_storage == 'ragged' else output
+        return output if len(bars) else None
+
+    def flush(self) -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths]:
+        """Return the bars not reported yet, including the in-progress one, without consuming them"""
+        if not self.unit:
+            return self._output(self._empty())
+
+        builder, parts = self, []
+        if not self.genesis_done:
+            builder = copy.deepcopy(self)
+            parts.append(builder._close_genesis())
+
+        index = builder._to_index(builder.bar_times)
+        prices = np.asarray(builder.bar_prices, dtype=np.float64)
+        paths = builder._paths(builder.bar_times, builder.bar_path, [0, len(builder.bar_times)])
+        if len(index):
+            parts.append(builder._bar_frame(
+                paths,
+                id=[builder.bar_id],
+                start_time=index[:1],
+                end_time=index[-1:],
+                open=prices[:1],
+                high=[prices.max()],
+                low=[prices.min()],
+                close=prices[-1:],
+                row_count=[len(prices)],
+                cumulative_imbalance=[builder.bar_path[-1]],
+                threshold=[builder.threshold_t],
+            ))
+        else:
+            # The last bar is always reported, even when no tick arrived after the last close
+            parts.append(builder._bar_frame(
+                paths,
+                id=[builder.bar_id],
+                start_time=index.insert(0, pd.NaT),
+                end_time=index.insert(0, pd.NaT),
+                open=[np.nan],
+                high=[np.nan],
+                low=[np.nan],
+                close=[np.nan],
+                row_count=[np.nan],
+                cumulative_imbalance=[np.nan],
+                threshold=[builder.threshold_t],
+            ))
+
+        return self._output(self._join(parts))
+
+    def state_dict(self) -> dict:
+        """Export the builder state as a flat dict of scalars and NumPy arrays"""
+        return {
+            'initial_collection': self.initial_collection,
+            'b_t_ewma': self.b_t_ewma,
+            'tsize_t_ewma': self.tsize_t_ewma,
+            'historical_threshold_limit': self.historical_threshold_limit,
+            'historical_threshold_collection': self.historical_threshold_collection,
+            'path_storage': self.path_storage,
+            'unit': self.unit,
+            'tz': self.tz,
+            'last_time': self.last_time,
+            'genesis_done': self.genesis_done,
+            'genesis_start': self.genesis_start,
+            'genesis_end': self.genesis_end,
+            'genesis_times': self.genesis_ticks[0],
+            'genesis_price': self.genesis_ticks[1],
+            'genesis_bid_vol': self.genesis_ticks[2],
+            'genesis_ask_vol': self.genesis_ticks[3],
+            'b_t': self.b_t,
+            'tsize_t': self.tsize_t,
+            'threshold_t': self.threshold_t,
+            'historical_threshold': np.asarray(self.historical_threshold, dtype=np.float64),
+            'bar_id': self.bar_id,
+            'previous': np.asarray(self.previous, dtype=np.float64),
+            'bar_times': np.asarray(self.bar_times, dtype=np.int64),
+            'bar_prices': np.asarray(self.bar_prices, dtype=np.float64),
+            'bar_path': np.asarray(self.bar_path, dtype=np.float64),
+        }
+
+    @classmethod
+    def from_state_dict(cls, state: dict) -> "OrderbookImbalanceBarBuilder":
+        """Rebuild a builder from `state_dict` output"""
+        def scalar(key):
+            return np.asarray(state[key]).item()
+
+        builder = cls(
+            initial_collection=scalar('initial_collection'),
+            b_t_ewma=scalar('b_t_ewma'),
+            tsize_t_ewma=scalar('tsize_t_ewma'),
+            historical_threshold_limit=scalar('historical_threshold_limit'),
+            historical_threshold_collection=scalar('historical_threshold_collection'),
+            path_storage=scalar('path_storage'),
+        )
+        builder.unit = scalar('unit')
+        builder.tz = scalar('tz')
+        builder.last_time = scalar('last_time')
+        builder.genesis_done = scalar('genesis_done')
+        builder.genesis_start = scalar('genesis_start')
+        builder.genesis_end = scalar('genesis_end')
+        builder.genesis_ticks = [
+            np.asarray(state['genesis_times'], dtype=np.int64),
+            np.asarray(state['genesis_price'], dtype=np.float64),
+            np.asarray(state['genesis_bid_vol'], dtype=np.float64),
+            np.asarray(state['genesis_ask_vol'], dtype=np.float64),
+        ]
+        builder.b_t = scalar('b_t')
+        builder.tsize_t = scalar('tsize_t')
+        builder.threshold_t = scalar('threshold_t')
+        builder.historical_threshold.extend(np.asarray(state['historical_threshold']).tolist())
+        builder.bar_id = scalar('bar_id')
+        builder.previous = tuple(np.asarray(state['previous']).tolist())
+        builder.bar_times = np.asarray(state['bar_times']).tolist()
+        builder.bar_prices = np.asarray(state['bar_prices']).tolist()
+        builder.bar_path = np.asarray(state['bar_path']).tolist()
+        return builder
+
+    def save(self, path: str):
+        """Checkpoint the builder state to a compressed .npz file"""
+        np.savez_compressed(path, **self.state_dict())
+
+    @classmethod
+    def load(cls, path: str) -> "OrderbookImbalanceBarBuilder":
+        """Resume a builder from a `save` checkpoint"""
+        with np.load(path) as data:
+            return cls.from_state_dict({key: data[key] for key in data.files})
+
+    def _ticks(self, df: pd.DataFrame) -> tuple:
+        """Sort a tick batch and split it into int64 times and float64 price / volume arrays"""
+        df = df.sort_index()
+        if not self.unit:
+            # The first tick fixes the time representation and the genesis window
+            self.unit = df.index.unit
+            self.tz = str(df.index.tz) if df.index.tz is not None else ''
+            self.genesis_start = int(df.index.asi8[0])
+            self.genesis_end = self.genesis_start + pd.Timedelta(seconds=self.initial_collection) // pd.Timedelta(1, unit=self.unit)
+            self.last_time = self.genesis_start
+
+        times = df.index.as_unit(self.unit).asi8
+        if times[0] < self.last_time:
+            raise ValueError(f"Batch starting at {df.index[0]} arrived out of order")
+        self.last_time = int(times[-1])
+
+        return (
+            times,
+            df['price'].to_numpy(dtype=np.float64),
+            df['non_spoofed_best_bid_volume'].to_numpy(dtype=np.float64),
+            df['non_spoofed_best_ask_volume'].to_numpy(dtype=np.float64),
+        )
+
+    def _to_index(self, values) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(np.asarray(values, dtype=np.int64).view(f'M8[{self.unit}]'))
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+
+    def _close_genesis(self) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        """Calibrate the first threshold on the genesis window and process the buffered ticks after it"""
+        times, price, bid_vol, ask_vol = self.genesis_ticks
+        self.genesis_ticks = [np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)]
+        self.genesis_done = True
+
+        # Genesis: inclusive on both ends, like `df.loc[genesis_start:genesis_end]`
+        stop = int(np.searchsorted(times, self.genesis_end, side='right'))
+        genesis_imbalance = ask_vol[:stop] - bid_vol[:stop]
+        self.b_t = genesis_imbalance.sum() / stop
+        self.tsize_t = stop
+        self.threshold_t = abs(self.b_t * self.tsize_t)
+        self.historical_threshold.append(self.threshold_t)
+
+        genesis = self._bar_frame(
+            self._paths(times[:stop], np.cumsum(genesis_imbalance), [0, stop]),
+            id=[0],
+            start_time=self._to_index([self.genesis_start]),
+            end_time=self._to_index([self.genesis_end]),
+            open=price[:1],
+            high=[price[:stop].max()],
+            low=[price[:stop].min()],
+            close=price[stop - 1:stop],
+            row_count=[stop],
+            cumulative_imbalance=[genesis_imbalance.sum()],
+            threshold=[np.nan],  # First bar has no threshold
+        )
+        self.bar_id = 1
+
+        # Ticks at exactly `genesis_end` belong to both the genesis and the first bar
+        self.previous = (price[stop - 1], bid_vol[stop - 1], ask_vol[stop - 1])
+        post = int(np.searchsorted(times, self.genesis_end, side='left'))
+        bars = self._process(times[post:], price[post:], bid_vol[post:], ask_vol[post:])
+        return self._join([genesis, bars])
+
+    def _process(self, times: np.ndarray, price: np.ndarray, bid_vol: np.ndarray, ask_vol: np.ndarray) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        """Run the adaptive threshold loop over post-genesis ticks, one iteration per bar"""
+        if len(times) == 0:
+            return self._empty()
+
+        changed = _changed_tick_mask(price, bid_vol, ask_vol, self.previous)
+        self.previous = (price[-1], bid_vol[-1], ask_vol[-1])
+        imbalance = bid_vol[changed] - ask_vol[changed]
+
+        # Continue the in-progress bar
+        k = len(self.bar_times)
+        tick_time = np.concatenate((np.asarray(self.bar_times, dtype=np.int64), times[changed]))
+        tick_price = np.concatenate((np.asarray(self.bar_prices, dtype=np.float64), price[changed]))
+        prefix = np.asarray(self.bar_path, dtype=np.float64)
+        carry = prefix[-1] if k else 0.0
+
+        starts, thresholds, paths = [], [], []
+        s, pos = 0, 0
+        while pos < len(imbalance):
+            e, path = _scan_imbalance(imbalance, pos, self.threshold_t, carry, window=max(int(self.tsize_t), 16))
+            path = np.concatenate((prefix, path))
+            if e < 0:
+                prefix = path
+                break
+
+            starts.append(s)
+            thresholds.append(self.threshold_t)
+            paths.append(path)
+            self._next_threshold(path[-1], len(path))
+            s, pos, carry, prefix = k + e + 1, e + 1, 0.0, np.empty(0)
+
+        self.bar_times = tick_time[s:].tolist()
+        self.bar_prices = tick_price[s:].tolist()
+        self.bar_path = prefix.tolist()
+
+        return self._closed_bar_frame(tick_time, tick_price, starts, paths, thresholds)
+
+    def _next_threshold(self, cumulative_imbalance: float, row_count: int):
+        """EWMA update of the threshold after a bar closes"""
+        self.b_t = (cumulative_imbalance / row_count) * self.b_t_ewma + (1 - self.b_t_ewma) * self.b_t
+        self.tsize_t = row_count * self.tsize_t_ewma + (1 - self.tsize_t_ewma) * self.tsize_t
+        threshold_t = abs(self.b_t * self.tsize_t)
+
+        # Capping the threshold based on the historical threshold limit
+        threshold_upper_limit = max(self.historical_threshold) * (1 + self.historical_threshold_limit)
+        threshold_lower_limit = min(self.historical_threshold) * (1 - self.historical_threshold_limit)
+        self.threshold_t = min(max(threshold_t, threshold_lower_limit), threshold_upper_limit)
+        self.historical_threshold.append(self.threshold_t)
+        self.bar_id += 1
+
+    def _closed_bar_frame(self, tick_time: np.ndarray, tick_price: np.ndarray, starts: list, paths: list, thresholds: list) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        """Bar table of contiguous closed bars. OHLC is reduced per bar with reduceat"""
+        starts = np.asarray(starts, dtype=np.int64)
+        row_count = np.asarray([len(p) for p in paths], dtype=np.int64)
+        ends = starts + row_count - 1
+        stop = ends[-1] + 1 if len(ends) else 0
+        index = self._to_index(tick_time[:stop])
+        ragged = self._paths(
+            tick_time[:stop],
+            np.concatenate(paths) if paths else np.empty(0),
+            np.concatenate(([0], np.cumsum(row_count))),
+        )
+        if len(starts):
+            high = np.maximum.reduceat(tick_price[:stop], starts)
+            low = np.minimum.reduceat(tick_price[:stop], starts)
+        else:
+            high = low = np.empty(0)
+
+        return self._bar_frame(
+            ragged,
+            id=np.arange(self.bar_id - len(starts), self.bar_id),
+            start_time=index[starts],
+            end_time=index[ends],
+            open=tick_price[starts],
+            high=high,
+            low=low,
+            close=tick_price[ends],
+            row_count=row_count,
+            cumulative_imbalance=np.asarray([p[-1] for p in paths], dtype=np.float64),
+            threshold=np.asarray(thresholds, dtype=np.float64),
+        )
+
+    def _paths(self, times, values, offsets) -> ImbalancePaths:
+        return ImbalancePaths(times, values, offsets, self.unit, self.tz)
+
+    def _empty(self) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        if not self.unit:
+            return pd.DataFrame(columns=[c for c in _BAR_COLUMNS if c != 'imbalance_path']), ImbalancePaths([], [], [0])
+        return self._closed_bar_frame(np.empty(0, dtype=np.int64), np.empty(0), [], [], [])
+
+    @staticmethod
+    def _bar_frame(paths: ImbalancePaths, **columns) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        return pd.DataFrame({key: columns[key] for key in _BAR_COLUMNS if key != 'imbalance_path'}), paths
+
+    @staticmethod
+    def _join(parts: list) -> Tuple[pd.DataFrame, ImbalancePaths]:
+        parts = [part for part in parts if len(part[0])] or parts[:1]
+        return pd.concat([bars for bars, _ in parts], ignore_index=True), ImbalancePaths.concat([paths for _, paths in parts])
+
+    def _output(self, part: Tuple[pd.DataFrame, ImbalancePaths]) -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths]:
+        """Bar table in the configured `path_storage` mode"""
+        bars, paths = part
+        if self.path_storage == 'ragged':
+            return bars, paths
+        bars.insert(_BAR_COLUMNS.index('imbalance_path'), 'imbalance_path', paths.to_lists())
+        return bars
+
+
+def orderbook_imbalance_information_bar_vectorized(df: pd.DataFrame,
+                                                   initial_collection: int,
+                                                   b_t_ewma: float,
+                                                   tsize_t_ewma: float,
+                                                   historical_threshold_limit: float = 0.2,
+                                                   historical_threshold_collection: int = 100,
+                                                   path_storage: Literal['list', 'ragged'] = 'list') -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths]:
+    """
+    Array engine for `orderbook_imbalance_information_bar`. Same arguments, same bar table.
+
+    Unchanged ticks are dropped with one vectorized comparison, and the adaptive EWMA
+    threshold loop runs once per bar (not once per tick) over plain NumPy arrays.
+    OHLC is reduced per bar with `np.maximum.reduceat` / `np.minimum.reduceat`.
+
+    `path_storage='ragged'` returns `(bars, ImbalancePaths)` with the per-bar imbalance
+    paths in flat arrays instead of an `imbalance_path` column of Python lists.
+    """
+    builder = OrderbookImbalanceBarBuilder(
+        initial_collection, b_t_ewma, tsize_t_ewma,
+        historical_threshold_limit, historical_threshold_collection,
+        path_storage='ragged'
+    )
+    bars = builder._join([builder.update(df), builder.flush()])
+    builder.path_storage = path_storage
+    return builder._output(bars)
+
+
+def _scan_runs(signs: np.ndarray,
+               start: int,
+               threshold: float,
+               window: int = 64) -> int:
+    """
+    Find the first tick from `start` where the longer side of the tick run crosses the threshold.
+
+    Buy and sell counts are accumulated in growing windows, like `_scan_imbalance`.
+
+    Returns:
+        int: close index, or -1 if the threshold is never crossed
+    """
+    n = len(signs)
+    buys, sells = 0, 0
+    pos = start
+    while pos < n:
+        end = min(pos + window, n)
+        buy_path = buys + np.cumsum(signs[pos:end] > 0)
+        sell_path = sells + np.cumsum(signs[pos:end] < 0)
+        crossed = np.maximum(buy_path, sell_path) > threshold
+        if crossed.any():
+            return pos + int(crossed.argmax())
+        buys, sells = buy_path[-1], sell_path[-1]
+        pos = end
+        window *= 2
+
+    return -1
+
+
+def _cumulative_starts(values: np.ndarray, threshold: float) -> list:
+    """Bar starts for bars that close once the sum of `values` since the bar start reaches the threshold"""
+    cumulative = np.cumsum(values)
+    starts = []
+    s, base = 0, 0.0
+    while s < len(values):
+        starts.append(s)
+        e = int(np.searchsorted(cumulative, base + threshold, side='left'))
+        if e >= len(values):
+            break  # Last bar - in progress
+        base = cumulative[e]
+        s = e + 1
+
+    return starts
+
+
+def _adaptive_starts(signs: np.ndarray,
+                     expected_ticks: int,
+                     expected_ewma: float,
+                     family: Literal['tick_imbalance', 'tick_run'],
+                     historical_threshold_limit: float = 0.2,
+                     historical_threshold_collection: int = 100) -> Tuple[list, list]:
+    """
+    Bar starts for tick-imbalance / tick-run bars with EWMA expectations.
+
+    theta_T is |sum(b)| for imbalance bars and max(#buys, #sells) for run bars. A bar closes when
+    theta_T > E[T] * E[theta_T / T], both expectations being EWMAs over the closed bars - the same
+    `b_t` / `tsize_t` scheme as the orderbook imbalance bar, including the historical threshold cap.
+    E[theta_T / T] is used instead of |2P[b=1] - 1|, which collapses the bars to single ticks when
+    buys and sells are balanced.
+
+    Returns:
+        (bar starts, threshold used by each bar)
+    """
+    def theta(lo: int, hi: int) -> float:
+        if family == 'tick_imbalance':
+            return abs(signs[lo:hi].sum())
+        return max(np.count_nonzero(signs[lo:hi] > 0), np.count_nonzero(signs[lo:hi] < 0))
+
+    genesis = min(expected_ticks, len(signs))
+    tsize_t = float(expected_ticks)
+    b_t = theta(0, genesis) / genesis if genesis else 0.0
+    # At least one tick: a zero genesis threshold (flat or balanced genesis window) would stay zero
+    # under the multiplicative historical cap and close every bar after a single tick
+    threshold_t = max(b_t * tsize_t, 1.0)
+    historical_threshold = deque([threshold_t], maxlen=historical_threshold_collection)
+
+    starts, thresholds = [], []
+    s = 0
+    while s < len(signs):
+        if family == 'tick_imbalance':
+            e, _ = _scan_imbalance(signs, s, threshold_t, window=max(int(tsize_t), 16))
+        else:
+            e = _scan_runs(signs, s, threshold_t, window=max(int(tsize_t), 16))
+        starts.append(s)
+        thresholds.append(threshold_t)
+        if e < 0:
+            break  # Last bar - in progress
+
+        row_count = e - s + 1
+        b_t = (theta(s, e + 1) / row_count) * expected_ewma + (1 - expected_ewma) * b_t
+        tsize_t = row_count * expected_ewma + (1 - expected_ewma) * tsize_t
+
+        # Capping the threshold based on the historical threshold limit
+        threshold_upper_limit = max(historical_threshold) * (1 + historical_threshold_limit)
+        threshold_lower_limit = min(historical_threshold) * (1 - historical_threshold_limit)
+        threshold_t = min(max(b_t * tsize_t, threshold_lower_limit), threshold_upper_limit)
+        historical_threshold.append(threshold_t)
+        s = e + 1
+
+    return starts, thresholds
+
+
+def _ohlcv_bar_table(times: pd.DatetimeIndex,
+                     price: np.ndarray,
+                     volume: np.ndarray,
+                     dollar_volume: np.ndarray,
+                     starts: list) -> pd.DataFrame:
+    """OHLC / volume / VWAP of contiguous bars starting at `starts`, reduced with reduceat"""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.append(starts[1:], len(price))[:len(starts)] - 1
+    if len(starts):
+        high = np.maximum.reduceat(price, starts)
+        low = np.minimum.reduceat(price, starts)
+        bar_volume = np.add.reduceat(volume, starts)
+        bar_dollar_volume = np.add.reduceat(dollar_volume, starts)
+    else:
+        high = low = bar_volume = bar_dollar_volume = np.empty(0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = bar_dollar_volume / bar_volume
+
+    return pd.DataFrame({
+        'id': np.arange(len(starts)),
+        'start_time': times[starts],
+        'end_time': times[ends],
+        'open': price[starts],
+        'high': high,
+        'low': low,
+        'close': price[ends],
+        'vwap': vwap,
+        'volume': bar_volume,
+        'dollar_volume': bar_dollar_volume,
+        'row_count': ends - starts + 1,
+    })
+
+
+def information_bars(df: pd.DataFrame,
+                     tick: int | None = None,
+                     volume: float | None = None,
+                     dollar: float | None = None,
+                     tick_imbalance: int | None = None,
+                     tick_run: int | None = None,
+                     expected_ewma: float = 0.1,
+                     historical_threshold_limit: float = 0.2,
+                     historical_threshold_collection: int = 100,
+                     volume_column: str = 'volume') -> dict:
+    """
+    Several information bar families over the same ticks in one call.
+
+    The ticks are sorted and filtered once: with orderbook columns present, ticks that change
+    neither price, bid volume, ask volume nor carry traded volume are dropped, as in
+    `orderbook_imbalance_information_bar`. Dollar volume, cumulative sums and tick-rule signs
+    are computed once and shared, then every family only searches its own bar boundaries
+    (one searchsorted / window scan per bar) and reduces OHLC / VWAP with reduceat.
+    The last bar of every family is in progress. Non-positive bar sizes raise ValueError.
+
+    Args:
+        df: ticks indexed by time with a `price` column, an optional `volume_column` and optional
+            `non_spoofed_best_bid_volume` / `non_spoofed_best_ask_volume` columns
+        tick: ticks per tick bar
+        volume: volume per volume bar
+        dollar: price * volume per dollar bar
+        tick_imbalance: initial expected ticks per tick-imbalance bar
+        tick_run: initial expected ticks per tick-run bar
+        expected_ewma: EWMA weight of E[T] and E[theta_T / T] (imbalance / run bars)
+        historical_threshold_limit: imbalance / run threshold cap relative to the recent thresholds
+        historical_threshold_collection: number of recent thresholds used for the cap
+        volume_column: traded volume column. Required by volume and dollar bars
+
+    Returns:
+        dict: {family: bar table} for every requested family
+    """
+    sizes = {'tick': tick, 'volume': volume, 'dollar': dollar, 'tick_imbalance': tick_imbalance, 'tick_run': tick_run}
+    invalid = {family: size for family, size in sizes.items() if size is not None and not size > 0}
+    if invalid:
+        raise ValueError(f"Bar sizes must be positive: {invalid}")
+
+    df = df.sort_index()
+    price = df['price'].to_numpy(dtype=np.float64)
+    if volume_column in df.columns:
+        traded = df[volume_column].to_numpy(dtype=np.float64)
+    elif volume is not None or dollar is not None:
+        raise ValueError(f"Volume and dollar bars need the `{volume_column}` column")
+    else:
+        traded = np.full(len(df), np.nan)
+
+    # Shared unchanged-tick filtering
+    changed = np.ones(len(df), dtype=bool)
+    if {'non_spoofed_best_bid_volume', 'non_spoofed_best_ask_volume'} <= set(df.columns):
+        changed = _changed_tick_mask(
+            price,
+            df['non_spoofed_best_bid_volume'].to_numpy(dtype=np.float64),
+            df['non_spoofed_best_ask_volume'].to_numpy(dtype=np.float64),
+            (np.nan, np.nan, np.nan),
+        ) | (traded > 0)
+    times = df.index[changed]
+    price = price[changed]
+    traded = traded[changed]
+    dollar_volume = price * traded
+
+    bars = dict()
+    if tick is not None:
+        bars['tick'] = _ohlcv_bar_table(times, price, traded, dollar_volume, list(range(0, len(price), tick)))
+    if volume is not None:
+        bars['volume'] = _ohlcv_bar_table(times, price, traded, dollar_volume, _cumulative_starts(traded, volume))
+    if dollar is not None:
+        bars['dollar'] = _ohlcv_bar_table(times, price, traded, dollar_volume, _cumulative_starts(dollar_volume, dollar))
+
+    if tick_imbalance is not None or tick_run is not None:
+        # Tick rule: sign of the price change, carrying the last sign over unchanged prices
+        signs = np.sign(np.diff(price, prepend=price[:1]))
+        last_move = np.where(signs != 0, np.arange(len(signs)), 0)
+        signs = signs[np.maximum.accumulate(last_move)] if len(signs) else signs
+
+        for family, expected_ticks in (('tick_imbalance', tick_imbalance), ('tick_run', tick_run)):
+            if expected_ticks is None:
+                continue
+            starts, thresholds = _adaptive_starts(
+                signs, expected_ticks, expected_ewma, family,
+                historical_threshold_limit, historical_threshold_collection
+            )
+            bars[family] = _ohlcv_bar_table(times, price, traded, dollar_volume, starts)
+            bars[family]['threshold'] = thresholds
+
+    return bars
+
+
+if __name__ == "__main__":
+    # Equivalence check: array engine vs. the iterrows implementation
+    rng = np.random.default_rng(0)
+    n = 5000
+    ticks = pd.DataFrame({
+        'price': 100 + np.round(np.cumsum(rng.choice([-0.01, 0.0, 0.0, 0.01], n)), 2),
+        'non_spoofed_best_bid_volume': rng.choice([1.0, 1.0, 2.0, 3.0, 5.0], n),
+        'non_spoofed_best_ask_volume': rng.choice([1.0, 1.0, 2.0, 4.0], n),
+    }, index=pd.Timestamp("2025-03-09") + pd.to_timedelta(np.arange(n), unit="s"))
+
+    expected = orderbook_imbalance_information_bar(ticks, 30, 0.1, 0.1)
+    result = orderbook_imbalance_information_bar_vectorized(ticks, 30, 0.1, 0.1)
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
+    print(f"OK - {len(result)} bars match")
+
+    # Streaming builder: batches + checkpoint/resume must reproduce the batch run
+    builder = OrderbookImbalanceBarBuilder(30, 0.1, 0.1)
+    streamed = []
+    for i, batch in enumerate(np.array_split(np.arange(n), 7)):
+        streamed.append(builder.update(ticks.iloc[batch]))
+        builder = OrderbookImbalanceBarBuilder.from_state_dict(builder.state_dict())
+    streamed.append(builder.flush())
+    streamed = pd.concat([f for f in streamed if len(f)], ignore_index=True)
+    pd.testing.assert_frame_equal(expected, streamed, check_exact=True)
+    print(f"OK - streamed {len(streamed)} bars match")
+
+    # Families on shared ticks: a flat genesis window must not pin the threshold at zero
+    flat = ticks.assign(price=np.r_[np.full(200, 100.0), ticks['price'].to_numpy()[200:]], volume=1.0)
+    families = information_bars(flat, tick=100, volume=250.0, tick_imbalance=50, tick_run=50)
+    assert families['tick_imbalance']['row_count'].mean() > 2 and families['tick_run']['row_count'].mean() > 2
+    try:
+        information_bars(flat, tick=0)
+        raise AssertionError("zero bar size accepted")
+    except ValueError:
+        pass
+    print("OK - " + ", ".join(f"{len(bars)} {family}" for family, bars in families.items()) + " bars")
@@ -0,0 +1,177 @@
+import pandas as pd
+import numpy as np
+
+from typing import Callable, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import os
+import time
+
+from src.features.information_bars import OrderbookImbalanceBarBuilder, ImbalancePaths, _BAR_COLUMNS
+
+
+def _atomic_write(path: str, write: Callable[[str], None]):
+    """Write through a temporary file so a crash never leaves a half-written partition"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _save_npz(path: str, compressed: bool = False, **arrays):
+    # Through a file object: np.savez appends `.npz` to file names that do not end with it
+    with open(path, 'wb') as f:
+        (np.savez_compressed if compressed else np.savez)(f, **arrays)
+
+
+def _build_symbol(symbol: str,
+                  days: List[date],
+                  loader: Callable[[str, date], pd.DataFrame],
+                  output_dir: str,
+                  builder_kwargs: dict) -> dict:
+    """
+    Build the imbalance bars of one symbol, one day partition at a time.
+
+    Days run in order so the threshold state (genesis, `b_t` / `tsize_t`, threshold history and the
+    in-progress bar) carries over day boundaries. Each finished day is committed with a builder
+    checkpoint, and a rerun resumes after the last committed day. Resuming with other `builder_kwargs`
+    than the checkpoint was built with raises ValueError: the committed days would not match.
+    """
+    symbol_dir = os.path.join(output_dir, symbol)
+    os.makedirs(symbol_dir, exist_ok=True)
+    checkpoint = os.path.join(symbol_dir, '_checkpoint.npz')
+
+    builder = OrderbookImbalanceBarBuilder(**builder_kwargs, path_storage='ragged')
+    last_day = ''
+    if os.path.exists(checkpoint):
+        with np.load(checkpoint) as data:
+            state = {key: data[key] for key in data.files}
+        changed = {key: (np.asarray(state[key]).item(), value) for key, value in builder_kwargs.items()
+                   if np.asarray(state[key]).item() != value}
+        if changed:
+            raise ValueError(f"{symbol}: checkpoint built with other settings (checkpoint, requested): {changed}")
+        builder = OrderbookImbalanceBarBuilder.from_state_dict(state)
+        last_day = state['day'].item()
+
+    ticks, bars, seconds = 0, 0, 0.0
+    for day in sorted(days):
+        day_str = day.strftime('%Y-%m-%d')
+        if day_str <= last_day:
+            continue  # Already committed by a previous run
+
+        df = loader(symbol, day)
+        start_time = time.perf_counter()
+        day_bars, day_paths = builder.update(df)
+        seconds += time.perf_counter() - start_time
+        ticks += len(df)
+        bars += len(day_bars)
+
+        # Partitioned store: {output_dir}/{symbol}/{day}.pkl + {day}.paths.npz
+        _atomic_write(os.path.join(symbol_dir, f'{day_str}.pkl'), day_bars.to_pickle)
+        _atomic_write(
+            os.path.join(symbol_dir, f'{day_str}.paths.npz'),
+            lambda path: _save_npz(path, times=day_paths.times, values=day_paths.values, offsets=day_paths.offsets)
+        )
+        _atomic_write(checkpoint, lambda path: _save_npz(path, compressed=True, day=day_str, **builder.state_dict()))
+
+    return {
+        'symbol': symbol,
+        'worker': os.getpid(),
+        'ticks': ticks,
+        'bars': bars,
+        'seconds': seconds,
+        'ticks_per_second': ticks / seconds if seconds > 0 else np.nan,
+    }
+
+
+def build_imbalance_bars(symbols: List[str],
+                         days: List[date],
+                         loader: Callable[[str, date], pd.DataFrame],
+                         output_dir: str,
+                         initial_collection: int,
+                         b_t_ewma: float,
+                         tsize_t_ewma: float,
+                         historical_threshold_limit: float = 0.2,
+                         historical_threshold_collection: int = 100,
+                         max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Orderbook imbalance bars for many symbols and day partitions on a process pool.
+
+    Symbols are spread across the workers. Within a symbol, day partitions run in order because
+    every day continues the previous day's threshold state; each day is written to the store as
+    soon as it is done. The store is laid out as
+
+        {output_dir}/{symbol}/{YYYY-MM-DD}.pkl         bars completed on that day
+        {output_dir}/{symbol}/{YYYY-MM-DD}.paths.npz   their imbalance paths (`ImbalancePaths` arrays)
+        {output_dir}/{symbol}/_checkpoint.npz          builder state after the last committed day
+
+    Rerunning with more days only processes the new ones; rerunning with other builder settings
+    raises ValueError. The in-progress bar of the last day stays in the checkpoint:
+    `OrderbookImbalanceBarBuilder.load(checkpoint).flush()` reports it.
+
+    Args:
+        symbols: e.g. `symbol_searcher.get_total_symbols()` from `src.data.binance`
+        days: day partitions to build
+        loader: picklable (module-level) function returning the ticks of (symbol, day)
+        output_dir: root of the partitioned output store
+        max_workers: process pool size. Defaults to the number of CPUs
+
+    Returns:
+        pd.DataFrame: per-symbol ticks, bars, seconds spent building bars (loading and writing
+            excluded) and ticks per second. Throughput per worker process is printed at the end
+    """
+    builder_kwargs = {
+        'initial_collection': initial_collection,
+        'b_t_ewma': b_t_ewma,
+        'tsize_t_ewma': tsize_t_ewma,
+        'historical_threshold_limit': historical_threshold_limit,
+        'historical_threshold_collection': historical_threshold_collection,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_build_symbol, symbol, days, loader, output_dir, builder_kwargs): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            report.append(result)
+            print(f"{result['symbol']}: {result['bars']} bars from {result['ticks']} ticks ({result['ticks_per_second']:.0f} ticks/s)")
+
+    report = pd.DataFrame(report, columns=['symbol', 'worker', 'ticks', 'bars', 'seconds', 'ticks_per_second'])
+
+    # Throughput per worker process
+    workers = report.groupby('worker')[['ticks', 'seconds']].sum()
+    for worker, row in workers.iterrows():
+        print(f"Worker {worker}: {row['ticks'] / row['seconds'] if row['seconds'] > 0 else float('nan'):.0f} ticks/s")
+
+    return report
+
+
+def load_imbalance_bars(output_dir: str, symbol: str, paths: bool = False) -> pd.DataFrame | Tuple[pd.DataFrame, ImbalancePaths]:
+    """
+    Read back every committed day partition of one symbol as a single bar table.
+
+    The bar table has no `imbalance_path` column (the store keeps paths in ragged layout);
+    `paths=True` also returns the joined `ImbalancePaths`, bar i of the table owning path i.
+    A symbol without committed bars gives an empty table with the bar columns.
+    """
+    symbol_dir = os.path.join(output_dir, symbol)
+    days = sorted(f[:-len('.pkl')] for f in os.listdir(symbol_dir) if f.endswith('.pkl')) if os.path.isdir(symbol_dir) else []
+    frames = [pd.read_pickle(os.path.join(symbol_dir, f'{day}.pkl')) for day in days]
+    frames = [f for f in frames if len(f)]
+    bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[c for c in _BAR_COLUMNS if c != 'imbalance_path'])
+    if not paths:
+        return bars
+
+    unit, tz = 'ns', ''
+    checkpoint = os.path.join(symbol_dir, '_checkpoint.npz')
+    if os.path.exists(checkpoint):
+        with np.load(checkpoint) as data:
+            unit, tz = data['unit'].item(), data['tz'].item()
+    parts = []
+    for day in days:
+        with np.load(os.path.join(symbol_dir, f'{day}.paths.npz')) as data:
+            parts.append(ImbalancePaths(data['times'], data['values'], data['offsets'], unit, tz))
+    return bars, ImbalancePaths.concat(parts) if parts else ImbalancePaths([], [], [0], unit, tz)
@@ -0,0 +1,255 @@
+import pandas as pd
+import numpy as np
+from scipy.stats import norm
+from statsmodels.tsa.adfvalues import _tau_maxs, _tau_mins, _tau_stars, _tau_smallps, _tau_largeps
+
+from typing import List, Tuple, Literal, Iterator
+from src.models.pairs.pair_pipeline import PairTrading
+
+# Same collinearity cut-off as `statsmodels.tsa.stattools.coint`
+_SQRTEPS = np.sqrt(np.finfo(np.double).eps)
+
+
+def mackinnonp(teststat: np.ndarray, regression: Literal['c', 'n', 'ct', 'ctt'] = 'c', N: int = 1) -> np.ndarray:
+    """
+    Vectorized MacKinnon (1994) approximate p-values, as `statsmodels.tsa.adfvalues.mackinnonp`.
+
+    The response surface tables are read once from statsmodels at import.
+
+    Args:
+        teststat: ADF / Engle-Granger statistics
+        regression: deterministic terms of the test regression
+        N: number of series (2 for a pair)
+    """
+    teststat = np.asarray(teststat, dtype=np.float64)
+    with np.errstate(invalid='ignore'):  # +-inf statistics are clipped below
+        small = np.polyval(_tau_smallps[regression][N - 1][::-1], teststat)
+        large = np.polyval(_tau_largeps[regression][N - 1][::-1], teststat)
+    pvalue = norm.cdf(np.where(teststat <= _tau_stars[regression][N - 1], small, large))
+    pvalue = np.where(teststat > _tau_maxs[regression][N - 1], 1.0, pvalue)
+    pvalue = np.where(teststat < _tau_mins[regression][N - 1], 0.0, pvalue)
+    return pvalue
+
+
+def _solve(gram: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    """Batched normal equations. Falls back to the pseudo-inverse (like OLS) for singular stacks"""
+    try:
+        return np.linalg.solve(gram, rhs)
+    except np.linalg.LinAlgError:
+        return np.matmul(np.linalg.pinv(gram), rhs)
+
+
+def _adf_design(x: np.ndarray, lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stacked ADF regressions (no deterministic terms) of many series with a common lag.
+
+    Args:
+        x: k x T series
+        lag: number of lagged differences
+
+    Returns:
+        (k x nobs x (lag + 1) regressors [level, diff lag 1..lag], k x nobs differences)
+    """
+    T = x.shape[1]
+    dx = np.diff(x, axis=1)
+    nobs = T - 1 - lag
+    Z = np.empty((x.shape[0], nobs, lag + 1))
+    Z[:, :, 0] = x[:, lag:T - 1]
+    for m in range(1, lag + 1):
+        Z[:, :, m] = dx[:, lag - m:T - 1 - m]
+    return Z, dx[:, lag:]
+
+
+def _adf_tstat(x: np.ndarray, lag: int) -> np.ndarray:
+    """t-statistic of the level coefficient for k series with the same lag"""
+    Z, y = _adf_design(x, lag)
+    gram = np.matmul(Z.transpose(0, 2, 1), Z)
+    beta = _solve(gram, np.matmul(Z.transpose(0, 2, 1), y[:, :, None]))[:, :, 0]
+    resid = y - np.matmul(Z, beta[:, :, None])[:, :, 0]
+    scale = (resid ** 2).sum(axis=1) / (Z.shape[1] - Z.shape[2])
+    cov00 = np.linalg.pinv(gram)[:, 0, 0]
+    return beta[:, 0] / np.sqrt(scale * cov00)
+
+
+def _aic_lags(gram: np.ndarray, zy: np.ndarray, yy: np.ndarray, nobs: int) -> np.ndarray:
+    """
+    adfuller's AIC lag selection from the maxlag regression moments of k series.
+
+    The regression with l lags is the leading (l + 1) x (l + 1) block of the maxlag Gram matrix.
+
+    Args:
+        gram: k x (maxlag + 1) x (maxlag + 1) Gram matrices of [level, diff lag 1..maxlag]
+        zy: k x (maxlag + 1) regressor / difference products
+        yy: k sums of squared differences
+        nobs: common sample size
+    """
+    maxlag = gram.shape[1] - 1
+    aic = np.empty((maxlag + 1, gram.shape[0]))
+    for lag in range(maxlag + 1):
+        beta = _solve(gram[:, :lag + 1, :lag + 1], zy[:, :lag + 1, None])[:, :, 0]
+        ssr = yy - (beta * zy[:, :lag + 1]).sum(axis=1)
+        aic[lag] = nobs * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1) + 2 * (lag + 1)
+    return aic.argmin(axis=0)
+
+
+def _adf_tstat_gram(gram: np.ndarray, zy: np.ndarray, yy: np.ndarray, nobs: int) -> np.ndarray:
+    """`_adf_tstat` from the regression moments instead of the series"""
+    beta = _solve(gram, zy[:, :, None])[:, :, 0]
+    scale = (yy - (beta * zy).sum(axis=1)) / (nobs - gram.shape[1])
+    cov00 = np.linalg.pinv(gram)[:, 0, 0]
+    return beta[:, 0] / np.sqrt(scale * cov00)
+
+
+def batch_adfuller(x: np.ndarray,
+                   maxlag: int | None = None,
+                   autolag: Literal['aic'] | None = 'aic') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ADF test without deterministic terms (`adfuller(regression='n')`) for many series together.
+
+    With `autolag='aic'` the lag is chosen as in adfuller: every lag 0..maxlag is fitted on the common
+    maxlag sample and the lowest AIC wins. All those nested regressions come from one Gram matrix per
+    series - the regression with l lags is its leading (l + 1) x (l + 1) block. The final regressions
+    are then solved in one batch per selected lag.
+
+    Args:
+        x: T x k series, one per column
+        maxlag: highest lag. Defaults to adfuller's Schwert rule 12 * (T / 100) ^ (1 / 4)
+        autolag: 'aic', or None to use `maxlag` for every series
+
+    Returns:
+        (ADF statistics, used lags)
+    """
+    x = np.asarray(x, dtype=np.float64).T
+    k, T = x.shape
+    if maxlag is None:
+        maxlag = min(T // 2 - 1, int(np.ceil(12.0 * np.power(T / 100.0, 1 / 4.0))))
+
+    if autolag is None:
+        return _adf_tstat(x, maxlag), np.full(k, maxlag)
+
+    # Lag selection on the common sample
+    Z, y = _adf_design(x, maxlag)
+    gram = np.matmul(Z.transpose(0, 2, 1), Z)
+    zy = np.matmul(Z.transpose(0, 2, 1), y[:, :, None])[:, :, 0]
+    usedlag = _aic_lags(gram, zy, (y ** 2).sum(axis=1), Z.shape[1])
+
+    # Final regressions on each lag's full sample
+    adfstat = np.empty(k)
+    for lag in np.unique(usedlag):
+        series = usedlag == lag
+        adfstat[series] = _adf_tstat(x[series], int(lag))
+
+    return adfstat, usedlag
+
+
+def iter_coint(price_path: pd.DataFrame,
+               pairs: List[Tuple[str, str]] | None = None,
+               maxlag: int | None = None,
+               autolag: Literal['aic'] | None = 'aic',
+               chunk_size: int = 256) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    `batch_coint`, one chunk of pairs at a time.
+
+    Yields:
+        (batch_coint rows of the chunk, residual spreads as a T x chunk_size array). Nothing for no pairs
+    """
+    var = price_path.to_numpy(dtype=np.float64).var(axis=0)
+    i, j = PairTrading._pair_index(price_path.columns, pairs)
+    if len(i) == 0:
+        return
+
+    for start, (params, spreads) in zip(
+        range(0, len(i), chunk_size),
+        PairTrading.batch_spread(price_path, pairs, chunk_size),
+    ):
+        # R^2 of the cointegrating regression. (Almost) perfectly colinear pairs: coint reports -inf
+        chunk = slice(start, start + chunk_size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsquared = params['hedge_ratio'].to_numpy() ** 2 * var[j[chunk]] / var[i[chunk]]
+        coint_t = np.full(len(params), -np.inf)
+        usedlag = np.zeros(len(params), dtype=np.int64)
+        testable = rsquared < 1 - 100 * _SQRTEPS
+        if testable.any():
+            coint_t[testable], usedlag[testable] = batch_adfuller(spreads[:, testable], maxlag, autolag)
+
+        params['coint_t'] = coint_t
+        params['pvalue'] = mackinnonp(coint_t, regression='c', N=2)
+        params['usedlag'] = usedlag
+        yield params, spreads
+
+
+def batch_coint(price_path: pd.DataFrame,
+                pairs: List[Tuple[str, str]] | None = None,
+                maxlag: int | None = None,
+                autolag: Literal['aic'] | None = 'aic',
+                chunk_size: int = 256) -> pd.DataFrame:
+    """
+    Engle-Granger cointegration test (`coint(asset1, asset2)`, trend 'c') for many pairs at once.
+
+    The cointegrating regressions come from `PairTrading.batch_spread`, the ADF regressions on their
+    residuals from `batch_adfuller`, and the p-values from the vectorized `mackinnonp`.
+
+    Tolerance against `statsmodels.tsa.stattools.coint`: statistics and p-values agree to ~1e-8
+    when the same lag is selected. The lag is chosen from Gram-matrix residual sums of squares, so a
+    near tie in AIC (|delta AIC| below ~1e-6) can select a neighbouring lag; pass `autolag=None` with a
+    fixed `maxlag` for a deterministic lag.
+
+    Args:
+        price_path: prices, one column per asset
+        pairs: (asset1, asset2) names. Defaults to `itertools.combinations(columns, 2)` order
+        maxlag, autolag: as in `coint`
+        chunk_size: pairs per batch. Memory is about T x (maxlag + 1) x chunk_size floats
+
+    Returns:
+        pd.DataFrame: asset1, asset2, intercept, hedge_ratio, coint_t, pvalue, usedlag. Empty (same
+            columns) for no pairs, e.g. `pairs=[]` or fewer than two columns
+    """
+    results = [params for params, _ in iter_coint(price_path, pairs, maxlag, autolag, chunk_size)]
+    if not results:
+        none = price_path.columns[np.zeros(0, dtype=np.int64)]
+        return pd.DataFrame({
+            'asset1': none,
+            'asset2': none,
+            'intercept': np.zeros(0),
+            'hedge_ratio': np.zeros(0),
+            'coint_t': np.zeros(0),
+            'pvalue': np.zeros(0),
+            'usedlag': np.zeros(0, dtype=np.int64),
+        })
+    return pd.concat(results, ignore_index=True)
+
+
+if __name__ == "__main__":
+    import time
+    import warnings
+    from statsmodels.tsa.stattools import coint
+
+    rng = np.random.default_rng(0)
+    T, N = 500, 210
+    common = np.cumsum(rng.normal(size=(T, 5)), axis=0)
+    prices = pd.DataFrame(
+        100 + common[:, rng.integers(0, 5, N)] * rng.uniform(0.5, 2, N) + np.cumsum(rng.normal(scale=0.3, size=(T, N)), axis=0),
+        columns=[f"A{k}" for k in range(N)]
+    )
+
+    start_time = time.perf_counter()
+    result = batch_coint(prices)
+    batch_seconds = time.perf_counter() - start_time
+    print(f"batch_coint: {len(result)} pairs in {batch_seconds:.2f}s")
+
+    # Tolerance check and speed-up on a sample of pairs
+    sample = result.sample(300, random_state=0)
+    start_time = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = np.array([coint(prices[a1], prices[a2])[1] for a1, a2 in zip(sample['asset1'], sample['asset2'])])
+    coint_seconds = (time.perf_counter() - start_time) / len(sample) * len(result)
+    print(f"coint (extrapolated): {coint_seconds:.2f}s - {coint_seconds / batch_seconds:.0f}x")
+    error = np.abs(sample['pvalue'].to_numpy() - expected).max()
+    print(f"max |pvalue - coint pvalue|: {error:.2e}")
+    assert error < 1e-8, error
+
+    # No pairs: empty table with the same columns and dtypes
+    for empty in (batch_coint(prices, pairs=[]), batch_coint(prices[['A0']])):
+        assert empty.empty and (empty.dtypes == result.dtypes).all(), empty.dtypes
+    print("OK - empty pair lists give an empty table")
@@ -0,0 +1,184 @@
+import pandas as pd
+import numpy as np
+
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+
+def column_digests(price_path: pd.DataFrame) -> Dict[str, str]:
+    """Content hash of every column (values and index) of a price window"""
+    index_hash = pd.util.hash_pandas_object(price_path.index, index=False).to_numpy()
+    return {
+        column: hashlib.blake2b(
+            index_hash.tobytes() + np.ascontiguousarray(price_path[column].to_numpy(dtype=np.float64)).tobytes(),
+            digest_size=16,
+        ).hexdigest()
+        for column in price_path.columns
+    }
+
+
+class PairStatsCache:
+    """
+    On-disk memo of pair statistics, bounded by LRU eviction.
+
+    Entries are keyed by the pair, the window bounds, the content hash of both price columns and the
+    test parameters, so changed prices or settings simply miss and the stale entry ages out. The store
+    is a SQLite database in WAL mode: any number of processes can read and write it concurrently, each
+    with its own connection (opened lazily, also after a fork).
+
+    Hits are served from an in-process LRU in front of the database in microseconds. Their access
+    times are written back with the next `put_many` (or `close`), or once `memory_entries` distinct
+    keys are waiting, so the on-disk LRU order stays close to real usage without a write per lookup
+    and a read-only session holds a bounded backlog.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, memory_entries: int = 100_000, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: on-disk bound; least recently used entries beyond it are evicted
+            memory_entries: bound of the in-process front cache
+            timeout: seconds to wait on a database locked by another process
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            # A connection must not cross a fork: every process opens its own
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS stats_last_access ON stats (last_access)')
+            self._pid = os.getpid()
+            self._memory.clear()
+            self._touched.clear()
+        return self._connection
+
+    @staticmethod
+    def key(asset1: str, asset2: str, start: int, end: int, digest1: str, digest2: str, params: dict) -> str:
+        """Cache key of one pair on one window"""
+        return hashlib.blake2b(
+            repr((asset1, asset2, start, end, digest1, digest2, sorted(params.items()))).encode(),
+            digest_size=20,
+        ).hexdigest()
+
+    def _remember(self, key: str, value: dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> dict | None:
+        """Cached statistics, or None"""
+        connection = self.connection
+        value = self._memory.get(key)
+        if value is None:
+            row = connection.execute('SELECT value FROM stats WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value = pickle.loads(row[0])
+        self._remember(key, value)
+        self._touched[key] = time.time()
+        if len(self._touched) >= self.memory_entries:
+            self.put_many([])  # Write the access times back
+        return value
+
+    def put_many(self, items: List[Tuple[str, dict]]):
+        """Store statistics in one transaction, write back access times and evict beyond `max_entries`"""
+        connection = self.connection
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO stats (key, value, last_access) VALUES (?, ?, ?)',
+                [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now) for key, value in items],
+            )
+            connection.executemany(
+                'UPDATE stats SET last_access = MAX(last_access, ?) WHERE key = ?',
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            excess = connection.execute('SELECT COUNT(*) FROM stats').fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM stats WHERE key IN (SELECT key FROM stats ORDER BY last_access LIMIT ?)', (excess,)
+                )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._touched.clear()
+        for key, value in items:
+            self._remember(key, value)
+
+    def put(self, key: str, value: dict):
+        self.put_many([(key, value)])
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM stats').fetchone()[0]
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            if self._touched:
+                self.put_many([])
+            self._connection.close()
+        self._connection = None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    def _writer(path: str, worker: int) -> int:
+        cache = PairStatsCache(path, max_entries=500)
+        for n in range(20):
+            cache.put_many([(f"{worker}-{n}-{k}", {'pvalue': float(k)}) for k in range(10)])
+        cache.close()
+        return worker
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pairs.sqlite')
+
+        # Concurrent writers, bounded size
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_writer, [path] * 4, range(4)))
+        cache = PairStatsCache(path, max_entries=500)
+        assert len(cache) == 500, len(cache)
+        print(f"OK - 4 concurrent writers, {len(cache)} entries kept")
+
+        # Lookup latency
+        key = PairStatsCache.key('A', 'B', 0, 500, 'x', 'y', {'min_lag': 2})
+        cache.put(key, {'pvalue': 0.01, 'hurst': 0.4})
+        start_time = time.perf_counter()
+        for _ in range(100_000):
+            cache.get(key)
+        print(f"Hit: {(time.perf_counter() - start_time) / 100_000 * 1e6:.2f}us")
+
+        # Read-only session over many keys: the access-time backlog stays bounded
+        small = PairStatsCache(path, memory_entries=100)
+        small.put_many([(f"r-{k}", {'pvalue': 0.5}) for k in range(1000)])
+        for k in range(1000):
+            small.get(f"r-{k}")
+            assert len(small._touched) < 100
+        print("OK - access times written back in batches")
+
+        fresh = PairStatsCache(path)
+        start_time = time.perf_counter()
+        assert fresh.get(key) == {'pvalue': 0.01, 'hurst': 0.4}
+        print(f"First hit from disk: {(time.perf_counter() - start_time) * 1e6:.0f}us")
@@ -4,13 +4,20 @@ import statsmodels.api as sm
 from statsmodels.tsa.stattools import coint
 
 import itertools
+import time
+from typing import List, Tuple, Iterator, Callable
 from src.util.extra import timeit
+from src.models.pairs.pair_cache import PairStatsCache, column_digests
 
 
 class PairTrading:
+    # Settings behind the pipeline statistics (coint trend / ADF lags, Hurst lags) - part of every cache key
+    STATISTICS_PARAMS = {'test': 'coint', 'trend': 'c', 'maxlag': None, 'autolag': 'aic', 'min_lag': 2, 'max_lag': 60}
+
     def __init__(self):
         self.start_time_loc = 0
         self.end_time_loc = 0
+        self.stage_report = None
 
     def set_interval(self, start_time_loc: int, interval: int):
         self.start_time_loc = start_time_loc
@@ -25,6 +32,83 @@ class PairTrading:
 
         return spread
 
+    @staticmethod
+    def pair_regression(price_path: pd.DataFrame, pairs: List[Tuple[str, str]] | None = None) -> pd.DataFrame:
+        """
+        OLS `asset1 ~ const + asset2` for many pairs at once.
+
+        Same model as `spread`, solved in closed form from the shared column means and the
+        covariance matrix: hedge_ratio = cov(a1, a2) / var(a2), intercept = mean(a1) - hedge_ratio * mean(a2).
+        One (T x N) matrix product replaces N^2 / 2 statsmodels fits; with an explicit `pairs` list
+        only the requested covariances are formed. Columns with NaN give NaN.
+
+        Args:
+            price_path: prices, one column per asset
+            pairs: (asset1, asset2) names. Defaults to `itertools.combinations(columns, 2)` order
+
+        Returns:
+            pd.DataFrame: asset1, asset2, intercept, hedge_ratio - one row per pair
+        """
+        X = price_path.to_numpy(dtype=np.float64)
+        mean = X.mean(axis=0)
+        centered = X - mean
+        var = (centered ** 2).mean(axis=0)
+
+        i, j = PairTrading._pair_index(price_path.columns, pairs)
+        if pairs is None:
+            cov = (centered.T @ centered / len(X))[i, j]
+        else:
+            # Only the requested entries, a bounded number of pairs at a time
+            cov = np.concatenate([np.empty(0)] + [
+                (centered[:, i[k:k + 4096]] * centered[:, j[k:k + 4096]]).mean(axis=0)
+                for k in range(0, len(i), 4096)
+            ])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hedge_ratio = cov / var[j]
+        intercept = mean[i] - hedge_ratio * mean[j]
+
+        return pd.DataFrame({
+            'asset1': price_path.columns[i],
+            'asset2': price_path.columns[j],
+            'intercept': intercept,
+            'hedge_ratio': hedge_ratio,
+        })
+
+    @staticmethod
+    def batch_spread(price_path: pd.DataFrame,
+                     pairs: List[Tuple[str, str]] | None = None,
+                     chunk_size: int = 1024) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+        """
+        Residual spreads of many pairs, `chunk_size` pairs at a time.
+
+        Memory stays bounded by T x chunk_size whatever the number of pairs.
+
+        Yields:
+            (pair_regression rows of the chunk, spreads as a T x chunk_size array - column k is pair k)
+        """
+        X = price_path.to_numpy(dtype=np.float64)
+        params = PairTrading.pair_regression(price_path, pairs)
+        i, j = PairTrading._pair_index(price_path.columns, pairs)
+        intercept = params['intercept'].to_numpy()
+        hedge_ratio = params['hedge_ratio'].to_numpy()
+
+        for start in range(0, len(params), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            spreads = X[:, i[chunk]] - (intercept[chunk] + hedge_ratio[chunk] * X[:, j[chunk]])
+            yield params.iloc[chunk].reset_index(drop=True), spreads
+
+    @staticmethod
+    def _pair_index(columns: pd.Index, pairs: List[Tuple[str, str]] | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Column positions (i, j) of the pairs. Defaults to every pair in combinations order"""
+        if pairs is None:
+            return np.triu_indices(len(columns), k=1)
+        pairs = np.asarray(pairs, dtype=object).reshape(-1, 2)
+        i, j = columns.get_indexer(pairs[:, 0]), columns.get_indexer(pairs[:, 1])
+        if (i < 0).any() or (j < 0).any():
+            missing = sorted(set(pairs[:, 0][i < 0]) | set(pairs[:, 1][j < 0]), key=str)
+            raise KeyError(f"Assets not in the price columns: {missing}")
+        return i, j
+
     @staticmethod
     def hurst_exponent(time_series: pd.Series, min_lag: int = 2, max_lag: int = 60):
         """
@@ -41,7 +125,9 @@ class PairTrading:
         """
         lags = range(min_lag, max_lag)
         # Calculate the standard deviation of the difference for each lag
-        tau = [np.std(np.subtract(time_series.iloc[lag:], time_series.iloc[:-lag])) for lag in lags]
+        # (positional: subtracting two pandas slices would align them on the index)
+        values = np.asarray(time_series, dtype=np.float64)
+        tau = [np.std(np.subtract(values[lag:], values[:-lag])) for lag in lags]
         tau = np.array(tau)
         
         # Replace zero values with a small number to avoid log(0)
@@ -52,36 +138,176 @@ class PairTrading:
         H = poly_coeffs[0]
         return H
 
+    @staticmethod
+    def hurst_exponents(spreads: np.ndarray | pd.DataFrame, min_lag: int = 2, max_lag: int = 60) -> np.ndarray:
+        """
+        `hurst_exponent` for many series at once. Columns are series.
+
+        Tau: sum of d_t and sum of d_t^2 (d_t = x_{t+lag} - x_t) for every lag and series from prefix
+            sums of x and x^2 plus one lagged cross product sum(x_{t+lag} * x_t) per lag - no
+            difference array is materialized. Series are demeaned first to limit cancellation.
+        H: the log-log fits share the same x (log lags), so every slope is solved in one
+            closed-form least-squares step: H = (x - mean(x)) @ (log tau - mean(log tau)) / Sxx.
+        `hurst_exponent` stays as the scalar reference implementation.
+
+        Returns:
+            np.ndarray: Hurst exponent of every column
+        """
+        X = np.asarray(spreads, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        X = X - X.mean(axis=0)
+        T = X.shape[0]
+        lags = np.arange(min_lag, max_lag)
+        zero = np.zeros((1, X.shape[1]))
+        prefix = np.vstack([zero, np.cumsum(X, axis=0)])
+        prefix_sq = np.vstack([zero, np.cumsum(X * X, axis=0)])
+
+        tau = np.empty((len(lags), X.shape[1]))
+        for k, lag in enumerate(lags):
+            n = T - lag
+            mean = ((prefix[T] - prefix[lag]) - prefix[n]) / n
+            sum_sq = (prefix_sq[T] - prefix_sq[lag]) + prefix_sq[n] - 2 * np.einsum('ij,ij->j', X[lag:], X[:n])
+            tau[k] = np.sqrt(np.maximum(sum_sq / n - mean ** 2, 0.0))
+
+        return PairTrading._hurst_slope(tau, lags)
+
+    @staticmethod
+    def _hurst_slope(tau: np.ndarray, lags: np.ndarray) -> np.ndarray:
+        """Slopes of the log-log fits of tau (lags x series) against lags"""
+        # Replace zero values with a small number to avoid log(0)
+        tau[tau == 0] = 1e-8
+
+        # Closed-form slope of every log-log fit
+        x = np.log(lags) - np.log(lags).mean()
+        y = np.log(tau)
+        return x @ (y - y.mean(axis=0)) / (x @ x)
+
     @timeit
-    def pipeline(self, asset_prices: pd.DataFrame):
+    def pipeline(self,
+                 asset_prices: pd.DataFrame,
+                 prefilter: Callable[[pd.DataFrame], List[Tuple[str, str]]] | None = None,
+                 cache: PairStatsCache | None = None):
+        """
+        Cointegrated and mean reverting pairs on the current interval.
+
+        Candidates go through the stages in order - optional pre-filter, missing data check,
+        cointegration (p-value < 0.05), Hurst exponent of the spread (< 0.5) - and each stage only
+        sees what the previous one kept. The number of candidates each stage removed and its run time
+        are printed and kept in `self.stage_report`.
+
+        With a cache, p-values and Hurst exponents are looked up by pair, interval, content hash of
+        both price columns and `STATISTICS_PARAMS` before being computed, and new results are stored
+        at the end. `cached` in the report counts the lookups served by the cache.
+
+        Args:
+            asset_prices: prices, one column per asset
+            prefilter: cheap candidate pruning on the price window, e.g. one of
+                `src.models.pairs.prefilter` (correlation_filter, cluster_filter, knn_filter)
+            cache: on-disk memo of pair statistics
+        """
         pairs = set()
+        report = []
+
+        def stage(name: str, kept: list, seconds: float, before: int, cached: int = 0):
+            report.append({'stage': name, 'removed': before - len(kept), 'remaining': len(kept), 'cached': cached, 'seconds': seconds})
 
         # Get all possible pairs of assets
         assets = asset_prices.columns
         candidate = list(itertools.combinations(assets, 2))
+        stage('candidates', candidate, 0.0, len(candidate))
 
         # Slice the asset_prices up
         price_path = asset_prices.iloc[self.start_time_loc : self.end_time_loc]
-        for a1, a2 in candidate:
-            a1_price_path = price_path[a1]
-            a2_price_path = price_path[a2]
 
-            if len(a1_price_path.dropna()) != len(a2_price_path.dropna()):
-                continue
+        if prefilter is not None:
+            start_time = time.perf_counter()
+            before, candidate = len(candidate), prefilter(price_path)
+            stage('prefilter', candidate, time.perf_counter() - start_time, before)
 
-            # Calculate Spread
-            spread = self.spread(a1_price_path, a2_price_path)
+        start_time = time.perf_counter()
+        before = len(candidate)
+        candidate = [
+            (a1, a2) for a1, a2 in candidate
+            if len(price_path[a1].dropna()) == len(price_path[a2].dropna())
+        ]
+        stage('missing data', candidate, time.perf_counter() - start_time, before)
 
-            # Calculate cointegration
-            _score, pvalue, _ = coint(a1_price_path, a2_price_path)
+        # Cached statistics of every candidate on this window
+        start_time = time.perf_counter()
+        records, keys, updated = {}, {}, set()
+        if cache is not None:
+            digests = column_digests(price_path)
+            for a1, a2 in candidate:
+                keys[a1, a2] = cache.key(a1, a2, self.start_time_loc, self.end_time_loc,
+                                         digests[a1], digests[a2], self.STATISTICS_PARAMS)
+                records[a1, a2] = dict(cache.get(keys[a1, a2]) or {})
+        lookup_seconds = time.perf_counter() - start_time
 
-            # Calculate Hurst Exponent
-            hurst = self.hurst_exponent(spread, 2, 60)
+        # Calculate cointegration
+        params = self.STATISTICS_PARAMS
+        start_time = time.perf_counter()
+        before, cached = len(candidate), 0
+        cointegrated = []
+        for a1, a2 in candidate:
+            record = records.setdefault((a1, a2), {})
+            if 'pvalue' in record:
+                cached += 1
+            else:
+                _score, record['pvalue'], _ = coint(price_path[a1], price_path[a2], trend=params['trend'],
+                                                    maxlag=params['maxlag'], autolag=params['autolag'])
+                updated.add((a1, a2))
+            if record['pvalue'] < 0.05:  # Series are cointegrated
+                cointegrated.append((a1, a2))
+        stage('cointegration', cointegrated, time.perf_counter() - start_time + lookup_seconds, before, cached)
 
-            condition1 = pvalue < 0.05  # Series are cointegrated
-            condition2 = hurst < 0.5  # Series is mean reverting
-            if condition1 and condition2:
+        # Calculate Hurst Exponent of the spread
+        start_time = time.perf_counter()
+        cached = 0
+        for a1, a2 in cointegrated:
+            record = records[a1, a2]
+            if 'hurst' in record:
+                cached += 1
+            else:
+                spread = self.spread(price_path[a1], price_path[a2])
+                record['hurst'] = self.hurst_exponent(spread, params['min_lag'], params['max_lag'])
+                updated.add((a1, a2))
+            if record['hurst'] < 0.5:  # Series is mean reverting
                 print(f"{a1} - {a2} have made the cut on {self.start_time_loc} ~ {self.end_time_loc}")
                 pairs.add((a1, a2))
-            
-        return pairs
\ No newline at end of file
+        if cache is not None and updated:
+            cache.put_many([(keys[pair], records[pair]) for pair in updated])
+        stage('hurst', pairs, time.perf_counter() - start_time, len(cointegrated), cached)
+
+        self.stage_report = pd.DataFrame(report).set_index('stage')
+        print(self.stage_report.to_string())
+
+        return pairs
+
+
+if __name__ == "__main__":
+    # Batched spreads vs. one statsmodels OLS per pair
+    rng = np.random.default_rng(0)
+    prices = pd.DataFrame(
+        100 + np.cumsum(rng.normal(size=(500, 12)), axis=0),
+        columns=[f"A{k}" for k in range(12)]
+    )
+    for params, spreads in PairTrading.batch_spread(prices, chunk_size=16):
+        for k, row in params.iterrows():
+            expected = PairTrading.spread(prices[row['asset1']], prices[row['asset2']])
+            np.testing.assert_allclose(spreads[:, k], expected.to_numpy(), rtol=1e-9, atol=1e-9)
+    print("OK - batched spreads match statsmodels")
+
+    # Vectorized Hurst exponents vs. the scalar reference
+    for params, spreads in PairTrading.batch_spread(prices, chunk_size=16):
+        hurst = PairTrading.hurst_exponents(spreads, 2, 60)
+        expected = [PairTrading.hurst_exponent(pd.Series(spreads[:, k]), 2, 60) for k in range(spreads.shape[1])]
+        np.testing.assert_allclose(hurst, expected, rtol=1e-9, atol=1e-9)
+    print("OK - vectorized Hurst exponents match")
+
+    try:
+        PairTrading.pair_regression(prices, [("A0", "A1"), ("A2", "B7")])
+        raise AssertionError("unknown asset accepted")
+    except KeyError as e:
+        assert "B7" in str(e)
+    print("OK - unknown assets raise KeyError")
@@ -0,0 +1,270 @@
+import pandas as pd
+import numpy as np
+
+from typing import List, Tuple
+
+PERFORMANCE_COLUMNS = [
+    'periods', 'final_equity', 'total_return', 'volatility', 'sharpe', 'sortino',
+    'max_drawdown', 'max_drawdown_duration', 'drawdown', 'drawdown_duration', 'turnover',
+]
+
+
+def drawdown(equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Running drawdown of equity curves along the last axis.
+
+    Returns:
+        (drawdown 1 - equity / running peak, duration in periods since the running peak), both shaped
+        like `equity`
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity, axis=-1)
+    index = np.broadcast_to(np.arange(equity.shape[-1]), equity.shape)
+    last_peak = np.maximum.accumulate(np.where(equity >= peak, index, 0), axis=-1)
+    return 1 - equity / peak, index - last_peak
+
+
+class RunningPerformance:
+    """
+    Performance metrics of one or many equity curves, updated as new equity points arrive.
+
+    The state is a handful of numbers per curve - last equity, running peak and its index, worst
+    drawdown and duration, and the count, mean, M2 and downside sum of squares of the period returns -
+    so an update costs O(new points) array operations whatever the history length. Chunks are merged
+    into the return moments with Chan's parallel update, so `update` in pieces gives the same metrics
+    as one `update` on the whole curve (to rounding).
+
+    Curves are the rows of a 2-D array (e.g. every point of a parameter grid) and are updated
+    together; a 1-D array is a single curve.
+    """
+
+    def __init__(self, curves: int = 1, periods_per_year: float = 365.0):
+        """
+        Args:
+            curves: number of equity curves
+            periods_per_year: annualization of volatility, Sharpe, Sortino and turnover (365 for daily
+                crypto bars, 365 * 24 * 60 for minute bars)
+        """
+        self.curves = curves
+        self.periods_per_year = periods_per_year
+        self.periods = 0
+        self.first = np.full(curves, np.nan)
+        self.last = np.full(curves, np.nan)
+        self.peak = np.full(curves, -np.inf)
+        self.peak_index = np.zeros(curves, dtype=np.int64)
+        self.max_drawdown = np.zeros(curves)
+        self.max_duration = np.zeros(curves, dtype=np.int64)
+        self.equity_sum = np.zeros(curves)
+        self.traded = np.zeros(curves)
+
+        self.returns = 0
+        self.mean = np.zeros(curves)
+        self.m2 = np.zeros(curves)
+        self.downside = np.zeros(curves)
+
+    def update(self, equity: np.ndarray, traded_value: np.ndarray | None = None):
+        """
+        Append equity points.
+
+        Args:
+            equity: (curves x n) or (n,) new equity points
+            traded_value: same shape, notional traded at each point (for turnover)
+        """
+        equity = np.asarray(equity, dtype=np.float64).reshape(self.curves, -1)
+        n = equity.shape[1]
+        if n == 0:
+            return
+        if traded_value is not None:
+            self.traded += np.asarray(traded_value, dtype=np.float64).reshape(self.curves, -1).sum(axis=1)
+
+        # Drawdown, continuing from the running peak
+        peak = np.maximum.accumulate(np.column_stack([self.peak, equity]), axis=1)[:, 1:]
+        index = self.periods + np.arange(n)
+        last_peak = np.maximum.accumulate(
+            np.column_stack([self.peak_index, np.where(equity >= peak, index, -1)]), axis=1
+        )[:, 1:]
+        self.max_drawdown = np.maximum(self.max_drawdown, (1 - equity / peak).max(axis=1))
+        self.max_duration = np.maximum(self.max_duration, (index - last_peak).max(axis=1))
+        self.peak, self.peak_index = peak[:, -1], last_peak[:, -1]
+
+        # Period returns, the first one against the previous chunk's last point
+        if self.periods == 0:
+            self.first = equity[:, 0].copy()
+            returns = equity[:, 1:] / equity[:, :-1] - 1
+        else:
+            returns = equity / np.column_stack([self.last, equity[:, :-1]]) - 1
+        m = returns.shape[1]
+        if m:
+            mean = returns.mean(axis=1)
+            m2 = ((returns - mean[:, None]) ** 2).sum(axis=1)
+            total = self.returns + m
+            delta = mean - self.mean
+            self.mean = self.mean + delta * m / total
+            self.m2 = self.m2 + m2 + delta ** 2 * self.returns * m / total
+            self.downside += (np.minimum(returns, 0) ** 2).sum(axis=1)
+            self.returns = total
+
+        self.last = equity[:, -1].copy()
+        self.equity_sum += equity.sum(axis=1)
+        self.periods += n
+
+    def metrics(self, names: List | pd.Index | None = None) -> pd.DataFrame:
+        """`PERFORMANCE_COLUMNS`, one row per curve"""
+        annual = np.sqrt(self.periods_per_year)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2 / (self.returns - 1)) if self.returns > 1 else np.full(self.curves, np.nan)
+            downside = np.sqrt(self.downside / self.returns) if self.returns else np.full(self.curves, np.nan)
+            frame = pd.DataFrame({
+                'periods': self.periods,
+                'final_equity': self.last,
+                'total_return': self.last / self.first - 1,
+                'volatility': std * annual,
+                'sharpe': self.mean / std * annual,
+                'sortino': self.mean / downside * annual,
+                'max_drawdown': self.max_drawdown,
+                'max_drawdown_duration': self.max_duration,
+                'drawdown': 1 - self.last / self.peak,
+                'drawdown_duration': self.periods - 1 - self.peak_index,
+                'turnover': self.traded / (self.equity_sum / self.periods) * self.periods_per_year / self.periods,
+            }, columns=PERFORMANCE_COLUMNS, index=names)
+        return frame
+
+
+def performance(equity: np.ndarray | pd.Series | pd.DataFrame,
+                periods_per_year: float = 365.0,
+                traded_value: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Performance of equity curves in one pass: returns, volatility, Sharpe / Sortino (zero risk-free
+    rate), maximum drawdown and its duration in periods, current drawdown and annualized turnover
+    (traded notional over mean equity).
+
+    Args:
+        equity: one curve (array / Series), or a batch - rows of a 2-D array, columns of a DataFrame
+        periods_per_year: annualization, see `RunningPerformance`
+        traded_value: notional traded at each point, shaped like the curves
+
+    Returns:
+        pd.DataFrame: `PERFORMANCE_COLUMNS`, one row per curve
+    """
+    names = None
+    if isinstance(equity, pd.DataFrame):
+        names, equity = equity.columns, equity.to_numpy(dtype=np.float64).T
+        traded_value = None if traded_value is None else np.asarray(traded_value, dtype=np.float64).T
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    running = RunningPerformance(len(equity), periods_per_year)
+    running.update(equity, traded_value)
+    return running.metrics(names)
+
+
+def traded_value(trades: pd.DataFrame, length: int) -> np.ndarray:
+    """Notional traded at each row by `pair_backtest` trades (both legs, entries and exits)"""
+    value = np.zeros(length)
+    np.add.at(value, trades['entry'].to_numpy(), (trades['quantity1'] * trades['entry_price1'] + trades['quantity2'] * trades['entry_price2']).to_numpy())
+    closed = trades[trades['exit'] >= 0]
+    np.add.at(value, closed['exit'].to_numpy(), (closed['quantity1'] * closed['exit_price1'] + closed['quantity2'] * closed['exit_price2']).to_numpy())
+    return value
+
+
+def trade_stats(trades: pd.DataFrame) -> pd.Series:
+    """
+    Distribution of the closed trades' PnL (`pair_backtest` trades, or any frame with a `pnl` column
+    and optionally `entry` / `exit` rows).
+    """
+    if 'exit' in trades:
+        trades = trades[trades['exit'] >= 0]
+    pnl = trades['pnl'].to_numpy(dtype=np.float64)
+    wins, losses = pnl[pnl > 0], pnl[pnl <= 0]
+    quantiles = np.quantile(pnl, [0.05, 0.25, 0.5, 0.75, 0.95]) if len(pnl) else np.full(5, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.Series({
+            'trades': len(pnl),
+            'win_rate': len(wins) / len(pnl) if len(pnl) else np.nan,
+            'total_pnl': pnl.sum(),
+            'mean_pnl': pnl.mean() if len(pnl) else np.nan,
+            'std_pnl': pnl.std(ddof=1) if len(pnl) > 1 else np.nan,
+            'pnl_5%': quantiles[0],
+            'pnl_25%': quantiles[1],
+            'median_pnl': quantiles[2],
+            'pnl_75%': quantiles[3],
+            'pnl_95%': quantiles[4],
+            'mean_win': wins.mean() if len(wins) else np.nan,
+            'mean_loss': losses.mean() if len(losses) else np.nan,
+            'profit_factor': wins.sum() / -losses.sum() if len(losses) else np.inf,
+            'mean_holding': (trades['exit'] - trades['entry']).mean() if 'entry' in trades and len(pnl) else np.nan,
+        })
+
+
+def segment_breakdown(equity: np.ndarray | pd.Series,
+                      segments: np.ndarray | pd.Series,
+                      periods_per_year: float = 365.0) -> pd.DataFrame:
+    """
+    Performance per segment (e.g. 'train' / 'real' periods, months, regimes) of one equity curve.
+
+    A period's return belongs to the segment of its end point; the drawdown peak restarts in every
+    segment. Everything is grouped array operations.
+
+    Returns:
+        pd.DataFrame: per segment periods, total_return, volatility, sharpe, max_drawdown
+    """
+    equity = pd.Series(np.asarray(equity, dtype=np.float64))
+    segments = np.asarray(segments)
+    returns = equity.pct_change()
+    frame = pd.DataFrame({'segment': segments, 'equity': equity, 'returns': returns})
+    grouped = frame.groupby('segment', sort=False)
+
+    peak = grouped['equity'].cummax()
+    frame['drawdown'] = 1 - equity / peak
+    frame['growth'] = np.log1p(returns)
+    grouped = frame.groupby('segment', sort=False)
+    mean, std = grouped['returns'].mean(), grouped['returns'].std(ddof=1)
+    annual = np.sqrt(periods_per_year)
+    return pd.DataFrame({
+        'periods': grouped.size(),
+        'total_return': np.expm1(grouped['growth'].sum()),
+        'volatility': std * annual,
+        'sharpe': mean / std * annual,
+        'max_drawdown': grouped['drawdown'].max(),
+    })
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    K, T = 500, 20_000
+    curves = 1000 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, size=(K, T)), axis=1))
+
+    # Reference: the notebook way, one curve at a time with pandas
+    start_time = time.perf_counter()
+    reference = []
+    for k in range(20):
+        s = pd.Series(curves[k])
+        r = s.pct_change().dropna()
+        dd = 1 - s / s.cummax()
+        reference.append((r.mean() / r.std() * np.sqrt(365), r.mean() / np.sqrt((r.clip(upper=0) ** 2).mean()) * np.sqrt(365), dd.max()))
+    reference_seconds = (time.perf_counter() - start_time) / 20 * K
+
+    start_time = time.perf_counter()
+    batch = performance(curves)
+    batch_seconds = time.perf_counter() - start_time
+    np.testing.assert_allclose(batch[['sharpe', 'sortino', 'max_drawdown']].to_numpy()[:20], np.array(reference), rtol=1e-9)
+
+    # Incremental: uneven chunks give the same metrics
+    running = RunningPerformance(K)
+    for chunk in np.array_split(curves, [1, 7, 5000, 12_345], axis=1):
+        running.update(chunk)
+    np.testing.assert_allclose(running.metrics().to_numpy(dtype=float), batch.to_numpy(dtype=float), rtol=1e-9)
+
+    # Drawdown duration against a scan
+    dd, duration = drawdown(curves[0])
+    peak_at, longest = 0, 0
+    for t in range(T):
+        if curves[0, t] >= curves[0, :t + 1].max():
+            peak_at = t
+        longest = max(longest, t - peak_at)
+    assert longest == duration.max() == batch['max_drawdown_duration'].iloc[0]
+    print(f"OK - {K} curves x {T} points in {batch_seconds:.2f}s (pandas per curve ~{reference_seconds:.1f}s)")
+
+    labels = np.repeat(['train', 'real'], [T // 2, T - T // 2])
+    print(segment_breakdown(curves[0], labels))
+    print(batch.describe().T[['mean', 'min', 'max']])
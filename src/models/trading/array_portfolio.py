@@ -0,0 +1,381 @@
+import pandas as pd
+import numpy as np
+
+from typing import Literal, Dict, List, Tuple
+from src.models.trading.portfolio import Order
+
+
+class ArrayPortfolio:
+    """
+    `AccountPortfolio` with positions in preallocated NumPy columns instead of `AccountAsset` objects.
+
+    One row per (trade, asset) position - the `AccountAsset` of `AccountPortfolio.assets[trade][asset]` -
+    with columns trade_id, asset (index into `asset_names`), side (1 buy / -1 sell), quantity,
+    book_price, accumulated_fee, accumulated_slippage, realized_pnl, open and trade_start (first row
+    of the trade: trade creation order). Trade ids are integers from a counter. The open positions are
+    indexed per asset as asset -> {trade_id: row}, so `force_exit_by_name` only touches the trades
+    holding that asset and liquidates them with array operations, and every row is indexed per trade
+    as trade_id -> [rows], so nothing scans the columns per fill.
+
+    The columns pay off in bulk: many open trades (less memory), force exits and vectorized valuation
+    of the open rows. A single fill is slower than on `AccountPortfolio` - it touches a dozen column
+    cells (through memoryviews, so plain Python floats and no NumPy scalars) where the object version
+    sets a few slots - and a pair round trip takes two to three times as long; for fill-by-fill order
+    flow with few open trades, use `AccountPortfolio`.
+
+    Every update performs the float operations of `AccountAsset.acquire` / `liquidate` in the same
+    order, so cash and PnL are identical to `AccountPortfolio` - including its conventions: the whole
+    accumulated fee and slippage are charged again at every (partial) exit, and `force_exit_by_name`
+    liquidates positions without removing them. The methods taking `Order`s are drop-in replacements;
+    `enter` / `exit` are the same operations on plain values.
+    """
+
+    COLUMNS = {
+        'trade_id': np.int64,
+        'asset': np.int32,
+        'side': np.int8,
+        'quantity': np.float64,
+        'book_price': np.float64,
+        'accumulated_fee': np.float64,
+        'accumulated_slippage': np.float64,
+        'realized_pnl': np.float64,
+        'open': np.bool_,
+        'trade_start': np.int64,
+    }
+
+    def __init__(self, initial_cash: float = 1000.0, capacity: int = 1024):
+        self.cash = initial_cash
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self._cells = {name: memoryview(column) for name, column in self.columns.items()}  # Scalar access
+
+        self.asset_names: List[str] = []
+        self._asset_index: Dict[str, int] = {}
+        self._by_asset: Dict[int, Dict[int, int]] = {}  # {asset: {trade_id: row}}, open positions
+        self._trades: Dict[int, Tuple[int, int]] = {}  # {trade_id: (first row, open positions)}
+        self._rows: Dict[int, List[int]] = {}  # {trade_id: rows}, every row ever created
+        self._next_id = 1  # From 1, as AccountPortfolio: always truthy
+
+    def __repr__(self):
+        a = list()
+        c = self.columns
+        rows = np.flatnonzero(c['open'][:self.size])
+        rows = rows[np.argsort(c['trade_start'][rows], kind='stable')]
+        for k, row in enumerate(rows):
+            if k == 0 or c['trade_id'][row] != c['trade_id'][rows[k - 1]]:
+                a.append(f"Trade {c['trade_id'][row]}")
+            a.append(f" - {self.asset_names[c['asset'][row]]}: {abs(c['book_price'][row] * c['quantity'][row])}")
+
+        astr = "\n".join(a)
+
+        repr = f"""
+Array Portfolio
+
+Trades: {len(self._trades)}
+Cash: {self.cash}
+
+{astr}
+"""
+        return repr
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Column views over the used rows: portfolio.quantity, portfolio.book_price, ...
+        if name in ArrayPortfolio.COLUMNS:
+            return self.columns[name][:self.size]
+        raise AttributeError(name)
+
+    def asset_id(self, asset: str) -> int:
+        index = self._asset_index.get(asset)
+        if index is None:
+            index = self._asset_index[asset] = len(self.asset_names)
+            self.asset_names.append(asset)
+            self._by_asset[index] = {}
+        return index
+
+    def new_trade_id(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def trade_rows(self, trade_id: int, asset: str | None = None) -> np.ndarray:
+        """Rows of a trade (open and closed), in creation order, optionally of one asset only"""
+        rows = np.array(self._rows.get(trade_id, ()), dtype=np.int64)
+        if asset is not None:
+            rows = rows[self.columns['asset'][rows] == self._asset_index.get(asset, -1)]
+        return rows
+
+    def _new_row(self, trade_id: int, asset: int, side: int) -> int:
+        if self.size == len(self.columns['quantity']):
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.zeros_like(column)])
+            self._cells = {name: memoryview(column) for name, column in self.columns.items()}
+        row = self.size
+        self.size += 1
+        c = self._cells
+        c['trade_id'][row] = trade_id
+        c['asset'][row] = asset
+        c['side'][row] = side
+        c['open'][row] = True
+        start, positions = self._trades.get(trade_id, (row, 0))
+        self._trades[trade_id] = (start, positions + 1)
+        c['trade_start'][row] = start
+        self._by_asset[asset][trade_id] = row
+        rows = self._rows.get(trade_id)
+        if rows is None:
+            self._rows[trade_id] = [row]
+        else:
+            rows.append(row)
+        return row
+
+    def _close_row(self, row: int):
+        c = self._cells
+        trade_id, asset = c['trade_id'][row], c['asset'][row]
+        c['open'][row] = False
+        del self._by_asset[asset][trade_id]
+        start, positions = self._trades[trade_id]
+        if positions == 1:
+            del self._trades[trade_id]
+        else:
+            self._trades[trade_id] = (start, positions - 1)
+
+    def _liquidate(self, row: int, exit_price: float, quantity_ratio: float, fee: float, slippage: float) -> float:
+        """`AccountAsset.liquidate` on a row: returns the revenue, books the PnL"""
+        c = self._cells
+        quantity = c['quantity'][row]
+        original_value = c['book_price'][row] * quantity * quantity_ratio
+        liquidated_value = exit_price * (quantity * quantity_ratio)
+        profit = (liquidated_value - original_value) * c['side'][row]
+
+        accumulated_fee = c['accumulated_fee'][row] + liquidated_value * fee
+        accumulated_slippage = c['accumulated_slippage'][row] + liquidated_value * slippage
+        c['accumulated_fee'][row] = accumulated_fee
+        c['accumulated_slippage'][row] = accumulated_slippage
+        total_fee = accumulated_fee + accumulated_slippage
+
+        c['quantity'][row] = quantity * (1 - quantity_ratio) if 1 - quantity_ratio > 0 else 0.0
+        c['realized_pnl'][row] = c['realized_pnl'][row] + (profit - total_fee)
+        return original_value + profit - total_fee
+
+    def _liquidate_rows(self, rows: np.ndarray, exit_price: float, quantity_ratio: float, fee: float, slippage: float) -> np.ndarray:
+        """`_liquidate` on many rows at once (same float operations): returns the revenues"""
+        c = self.columns
+        quantity = c['quantity'][rows]
+        original_value = c['book_price'][rows] * quantity * quantity_ratio
+        liquidated_value = exit_price * (quantity * quantity_ratio)
+        profit = (liquidated_value - original_value) * c['side'][rows]
+
+        accumulated_fee = c['accumulated_fee'][rows] + liquidated_value * fee
+        accumulated_slippage = c['accumulated_slippage'][rows] + liquidated_value * slippage
+        c['accumulated_fee'][rows] = accumulated_fee
+        c['accumulated_slippage'][rows] = accumulated_slippage
+        total_fee = accumulated_fee + accumulated_slippage
+
+        c['quantity'][rows] = quantity * (1 - quantity_ratio) if 1 - quantity_ratio > 0 else 0
+        c['realized_pnl'][rows] += profit - total_fee
+        return original_value + profit - total_fee
+
+    def enter(self,
+              trade_id: int,
+              asset: str,
+              price: float,
+              quantity_ratio: float,
+              side: Literal["buy", "sell"] | None,
+              fee: float = 0.0,
+              slippage: float = 0.0) -> bool:
+        """`AccountPortfolio.enter_position` without the Order"""
+        if self.cash < 10:
+            print("Order failed: Not enough cash")
+            return False
+
+        # Calculate quantity
+        budget = max(self.cash * quantity_ratio, 10)  # At least 10 quoting assets (USDT)
+        quantity = budget / price
+
+        asset_id = self.asset_id(asset)
+        row = self._by_asset[asset_id].get(trade_id)
+        if row is None:
+            row = self._new_row(trade_id, asset_id, 1 if side == "buy" else -1)
+            c = self._cells
+            c['book_price'][row] = price
+            c['quantity'][row] = quantity
+            c['accumulated_fee'][row] = price * quantity * fee
+            c['accumulated_slippage'][row] = price * quantity * slippage
+        else:
+            # AccountAsset.acquire: weighted average book price
+            c = self._cells
+            book_price, held = c['book_price'][row], c['quantity'][row]
+            c['book_price'][row] = ((book_price * held) + (price * quantity)) / (held + quantity)
+            c['quantity'][row] = held + quantity
+            c['accumulated_fee'][row] = c['accumulated_fee'][row] + price * quantity * fee
+            c['accumulated_slippage'][row] = c['accumulated_slippage'][row] + price * quantity * slippage
+
+        # Update cash
+        self.cash -= budget
+
+        return True
+
+    def exit(self,
+             trade_id: int,
+             asset: str,
+             price: float,
+             quantity_ratio: float,
+             fee: float = 0.0,
+             slippage: float = 0.0) -> bool:
+        """`AccountPortfolio.exit_position` without the Order"""
+        if trade_id not in self._trades:
+            print("Exit failed: No trade_id in portfolio")
+            return False
+
+        asset_id = self._asset_index.get(asset)
+        row = None if asset_id is None else self._by_asset[asset_id].get(trade_id)
+        if row is None:
+            print("Exit failed: No asset in portfolio")
+            return False
+        self.cash += self._liquidate(row, price, quantity_ratio, fee, slippage)
+
+        if self._cells['quantity'][row] == 0:
+            self._close_row(row)
+
+        return True
+
+    def enter_position(self, id: int, order: Order, fee: float = 0.0, slippage: float = 0.0) -> bool:
+        return self.enter(id, order.asset, order.price, order.quantity_ratio, order.side, fee, slippage)
+
+    def exit_position(self, id: int, exit_order: Order, fee: float = 0.0, slippage: float = 0.0) -> bool:
+        return self.exit(id, exit_order.asset, exit_order.price, exit_order.quantity_ratio, fee, slippage)
+
+    def pair_enter(self, order1: Order, order2: Order, fee: float = 0.0, slippage: float = 0.0) -> int | None:
+        key = self.new_trade_id()
+
+        # Enter position
+        success1 = self.enter_position(key, order1, fee, slippage)
+        success2 = self.enter_position(key, order2, fee, slippage)
+
+        if not success1 and not success2:
+            print("Failed to enter pair position")
+            return None
+
+        # Return pair key
+        return key
+
+    def pair_exit(self, id: int, long_order: Order, short_order: Order, fee: float = 0.0, slippage: float = 0.0):
+        success1 = self.exit_position(id, long_order, fee, slippage)
+        success2 = self.exit_position(id, short_order, fee, slippage)
+
+        if not success1 and not success2:
+            print("Failed to exit pair position")
+            return None
+
+        return True
+
+    def force_exit_by_name(self, a1: str, price: float, fee: float = 0.0, slippage: float = 0.0):
+        trades = self._by_asset.get(self._asset_index.get(a1), {})
+        if not trades:
+            return
+        # Same order as AccountPortfolio: by trade creation
+        rows = np.fromiter(trades.values(), dtype=np.int64, count=len(trades))
+        rows = rows[np.argsort(self.columns['trade_start'][rows], kind='stable')]
+
+        # Liquidate and add revenue (cash += revenue trade by trade: a sequential cumulative sum)
+        revenue = self._liquidate_rows(rows, price, 1, fee, slippage)
+        self.cash = np.cumsum(np.r_[self.cash, revenue])[-1].item()
+
+        print("\n".join(f"FORCE LIQUIDATION {trade_id}. {a1}. for {round(price, 4)}" for trade_id in self.columns['trade_id'][rows]))
+
+    def force_remove_by_id(self, id: int):
+        if id not in self._trades:
+            raise KeyError(id)
+        is_open = self._cells['open']
+        for row in self._rows[id]:
+            if is_open[row]:
+                self._close_row(row)
+
+    def open_trades(self, asset: str) -> List[int]:
+        """Open trade ids holding `asset`"""
+        return list(self._by_asset.get(self._asset_index.get(asset), {}))
+
+    def positions(self, open_only: bool = False) -> pd.DataFrame:
+        """Position rows as a DataFrame (asset names resolved)"""
+        frame = pd.DataFrame({name: column[:self.size] for name, column in self.columns.items()})
+        frame['asset'] = np.array(self.asset_names, dtype=object)[frame['asset']] if self.size else frame['asset']
+        return frame[frame['open']] if open_only else frame
+
+
+if __name__ == "__main__":
+    import time
+    import io
+    import contextlib
+    from src.models.trading.portfolio import AccountPortfolio
+
+    # Random order flow on both portfolios: identical cash and positions
+    rng = np.random.default_rng(0)
+    names = [f"S{k}" for k in range(8)]
+    reference, portfolio = AccountPortfolio(10_000.0), ArrayPortfolio(10_000.0, capacity=4)
+    keys = []  # (AccountPortfolio key, ArrayPortfolio key, asset1, asset2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for step in range(20_000):
+            op = rng.random()
+            price = float(rng.uniform(5, 15))
+            if op < 0.35 or not keys:
+                a1, a2 = rng.choice(names, 2, replace=False)
+                ratio = float(rng.uniform(0.01, 0.1))
+                orders = (Order(a1, price, ratio, "buy"), Order(a2, price * 1.1, ratio, "sell"))
+                reference_key, int_key = reference.pair_enter(*orders, 0.0004, 0.0001), portfolio.pair_enter(*orders, 0.0004, 0.0001)
+                if reference_key is not None:
+                    keys.append((reference_key, int_key, a1, a2))
+            elif op < 0.5:
+                reference_key, int_key, a1, a2 = keys[rng.integers(len(keys))]
+                order = Order(a1, price, float(rng.uniform(0.01, 0.05)), "buy")
+                reference.enter_position(reference_key, order, 0.0004)
+                portfolio.enter_position(int_key, order, 0.0004)
+            elif op < 0.9:
+                reference_key, int_key, a1, a2 = keys[rng.integers(len(keys))]
+                ratio = float(rng.choice([0.5, 1.0]))
+                orders = (Order(a1, price, ratio), Order(a2, price * 1.05, ratio))
+                reference.pair_exit(reference_key, *orders, 0.0004, 0.0001)
+                portfolio.pair_exit(int_key, *orders, 0.0004, 0.0001)
+            elif op < 0.97:
+                name = names[rng.integers(len(names))]
+                reference.force_exit_by_name(name, price, 0.0004)
+                portfolio.force_exit_by_name(name, price, 0.0004)
+            else:
+                reference_key, int_key, a1, a2 = keys.pop(rng.integers(len(keys)))
+                if reference_key in reference.assets:
+                    reference.force_remove_by_id(reference_key)
+                    portfolio.force_remove_by_id(int_key)
+            assert reference.cash == portfolio.cash, step
+
+    expected = {(reference_key, asset) for reference_key, assets in reference.assets.items() for asset in assets}
+    mapping = {reference_key: int_key for reference_key, int_key, _, _ in keys}
+    open_rows = portfolio.positions(open_only=True)
+    assert len(expected) == len(open_rows)
+    for reference_key, asset in expected:
+        row = open_rows[(open_rows['trade_id'] == mapping[reference_key]) & (open_rows['asset'] == asset)].iloc[0]
+        assert row['quantity'] == reference.assets[reference_key][asset].quantity
+        assert row['book_price'] == reference.assets[reference_key][asset].book_price
+    print(f"OK - identical cash ({portfolio.cash:.6f}) and {len(open_rows)} open positions")
+
+    # Throughput: 1e5 pair round trips (the per-fill path, where AccountPortfolio is faster)
+    for cls in (AccountPortfolio, ArrayPortfolio):
+        book = cls(1e12)
+        start_time = time.perf_counter()
+        for k in range(100_000):
+            key = book.pair_enter(Order("A", 10.0, 0.0001, "buy"), Order("B", 11.0, 0.0001, "sell"), 0.0004)
+            book.pair_exit(key, Order("A", 10.5, 1), Order("B", 10.5, 1), 0.0004)
+        print(f"{cls.__name__}: {100_000 / (time.perf_counter() - start_time):.0f} pair round trips/s")
+
+    # Many open trades: memory and force exits (AccountPortfolio scans every trade)
+    import tracemalloc
+    for cls in (AccountPortfolio, ArrayPortfolio):
+        tracemalloc.start()
+        book = cls(1e12)
+        for k in range(100_000):
+            book.pair_enter(Order(f"S{k % 50}", 10.0, 1e-8, "buy"), Order(f"S{(k + 1) % 50}", 11.0, 1e-8, "sell"))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for k in range(200):
+                book.force_exit_by_name(f"S{k % 50}-absent" if k % 2 else f"S{k % 50}", 10.5)
+        print(f"{cls.__name__}: {memory / 1e6:.0f} MB for 1e5 open pair trades, "
+              f"{(time.perf_counter() - start_time) / 200 * 1e3:.2f} ms per force_exit_by_name")
+
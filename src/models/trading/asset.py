@@ -26,6 +26,10 @@ from typing import Literal, Tuple
 
 
 class AccountAsset:
+    # Slotted: one per open leg, created and updated on every fill
+    __slots__ = ('name', 'book_price', 'quantity', 'side', 'buy_sell_normalizer', 'fee', 'slippage',
+                 'accumulated_fee', 'accumulated_slippage')
+
     def __init__(self, 
                  name: str, 
                  acquired_price: float, 
@@ -0,0 +1,313 @@
+import pandas as pd
+import numpy as np
+
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from multiprocessing import shared_memory
+import hashlib
+import itertools
+import json
+import os
+import time
+import uuid
+
+from src.features.parallel_bars import _atomic_write, _save_npz
+from src.models.pairs.screening import _screen_chunk, SCREEN_DTYPE
+from src.models.pairs.pair_pipeline import PairTrading
+from src.models.trading.threshold import Threshold2Sigma
+from src.models.trading.backtest import pair_backtest
+
+# Parameters of one grid point, all required: formation window length (rows before `formation_end`),
+# entry threshold in formation standard deviations of the spread, fee and slippage rates
+GRID_PARAMS = ['window', 'threshold', 'fee', 'slippage']
+
+RESULT_COLUMNS = GRID_PARAMS + [
+    'key', 'pairs', 'trades', 'final_equity', 'total_return', 'max_drawdown', 'seconds',
+]
+
+# Worker-side view of the shared prices, set once per process by `_attach`
+_PRICES: np.ndarray | None = None
+_SEGMENT: shared_memory.SharedMemory | None = None
+
+
+def _attach(name: str, shape: Tuple[int, int]):
+    """Pool initializer: map the shared prices without copying them"""
+    global _PRICES, _SEGMENT
+    # Pool workers share the parent's resource tracker, which unlinks the segment once at the end
+    _SEGMENT = shared_memory.SharedMemory(name=name)
+    _PRICES = np.ndarray(shape, dtype=np.float64, buffer=_SEGMENT.buf)
+    _formation.cache_clear()
+
+
+def parameter_grid(space: Dict[str, list]) -> List[dict]:
+    """Every combination of the parameter values, the last parameter varying fastest"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def point_key(params: dict) -> str:
+    """Identity of a grid point in the results store (NumPy scalars key like the Python values they hold)"""
+    values = json.dumps({name: params[name] for name in GRID_PARAMS}, sort_keys=True,
+                        default=lambda value: value.item() if isinstance(value, np.generic) else str(value))
+    return hashlib.blake2b(values.encode(), digest_size=12).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _formation(window: int, formation_end: int, pvalue: float, hurst: float, settings: Tuple,
+               chunk_size: int = 512) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Screening of one formation window, shared by every grid point with that window in this process.
+    Pairs are screened `chunk_size` at a time, as in `screen_pairs`, so the spreads held at once stay
+    bounded whatever the number of assets.
+
+    Returns:
+        (asset1 columns, asset2 columns, intercepts, hedge ratios, formation spread standard deviations)
+        of the selected pairs
+    """
+    X = _PRICES[formation_end - window:formation_end]
+    complete = np.flatnonzero(~np.isnan(X).any(axis=0))
+    i, j = (complete[np.asarray(index, dtype=np.int32)] for index in PairTrading._pair_index(pd.RangeIndex(len(complete)), None))
+    if len(i) == 0:
+        # Fewer than two assets complete in the window (late listings, gaps): nothing to screen
+        keep = np.empty(0, dtype=SCREEN_DTYPE)
+        return keep['asset1'], keep['asset2'], keep['intercept'], keep['hedge_ratio'], np.empty(0)
+    keep = []
+    for start in range(0, len(i), chunk_size):
+        result = _screen_chunk(i[start:start + chunk_size], j[start:start + chunk_size], *settings, prices=X)
+        keep.append(result[(result['pvalue'] < pvalue) & (result['hurst'] < hurst)])
+    keep = np.concatenate(keep)
+    spreads = X[:, keep['asset1']] - (keep['intercept'] + keep['hedge_ratio'] * X[:, keep['asset2']])
+    return keep['asset1'], keep['asset2'], keep['intercept'], keep['hedge_ratio'], spreads.std(axis=0, ddof=1)
+
+
+def _run_point(params: dict,
+               formation_end: int,
+               pvalue: float,
+               hurst: float,
+               settings: Tuple,
+               quantity_ratio: float,
+               initial_cash: float,
+               chunk_size: int = 512) -> dict:
+    """Screening -> Threshold2Sigma -> pair_backtest for one grid point, capital split evenly across the pairs"""
+    start_time = time.perf_counter()
+    i, j, intercept, hedge_ratio, sigma = _formation(int(params['window']), formation_end, pvalue, hurst, settings, chunk_size)
+    trading = _PRICES[formation_end:]
+
+    equity = np.full(len(trading), float(initial_cash))
+    trades = 0
+    if len(i):
+        equity[:] = 0.0
+        cash = initial_cash / len(i)
+        for k in range(len(i)):
+            spread = pd.Series(trading[:, i[k]] - (intercept[k] + hedge_ratio[k] * trading[:, j[k]]))
+            position, _ = Threshold2Sigma(spread, params['threshold'] * sigma[k]).position_signals()
+            pair_trades, _, pair_equity = pair_backtest(trading[:, i[k]], trading[:, j[k]], position,
+                                                        quantity_ratio, params['fee'], params['slippage'], cash)
+            trades += len(pair_trades)
+            equity += pair_equity
+
+    peak = np.maximum.accumulate(np.r_[initial_cash, equity])
+    return {
+        **{name: params[name] for name in GRID_PARAMS},
+        'key': point_key(params),
+        'pairs': len(i),
+        'trades': trades,
+        'final_equity': equity[-1] if len(equity) else float(initial_cash),
+        'total_return': (equity[-1] if len(equity) else initial_cash) / initial_cash - 1,
+        'max_drawdown': np.max(1 - np.r_[initial_cash, equity] / peak),
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def _save_json(path: str, value: dict):
+    with open(path, 'w') as f:
+        json.dump(value, f)
+
+
+def _flush(output_dir: str, rows: List[dict]):
+    """Commit finished grid points as one columnar part: one array per result column"""
+    if not rows:
+        return
+    # Commit time, then names unique across processes: concurrent runners never overwrite each other's parts
+    path = os.path.join(output_dir, f'part-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.npz')
+    columns = {name: np.array([row[name] for row in rows]) for name in RESULT_COLUMNS}
+    _atomic_write(path, lambda tmp: _save_npz(tmp, **columns))
+    rows.clear()
+
+
+def load_grid_results(output_dir: str) -> pd.DataFrame:
+    """Every committed grid point of a results store, in completion order"""
+    files = sorted(f for f in os.listdir(output_dir) if f.startswith('part-') and f.endswith('.npz')) if os.path.isdir(output_dir) else []
+    frames = []
+    for f in files:
+        with np.load(os.path.join(output_dir, f)) as data:
+            frames.append(pd.DataFrame({name: data[name] for name in RESULT_COLUMNS}))
+    if not frames:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_grid(price_path: pd.DataFrame,
+             space: Dict[str, list],
+             output_dir: str,
+             formation_end: int,
+             quantity_ratio: float = 0.5,
+             initial_cash: float = 1000.0,
+             pvalue: float = 0.05,
+             hurst: float = 0.5,
+             min_lag: int = 2,
+             max_lag: int = 60,
+             chunk_size: int = 512,
+             max_workers: int | None = None,
+             flush_every: int = 16) -> pd.DataFrame:
+    """
+    Parameter grid of the screening -> signal -> backtest chain on a process pool.
+
+    Each grid point screens the `window` rows before `formation_end` (Engle-Granger p-value and Hurst
+    exponent, as `screen_pairs`), trades every selected pair after `formation_end` with Threshold2Sigma
+    at `threshold` formation standard deviations of its spread, and backtests it with `pair_backtest`,
+    the capital split evenly across the pairs. Points sharing a window reuse a worker's screening.
+
+    The prices are copied once into a shared memory segment that every worker maps read-only at
+    start-up. Finished points stream into a columnar store as they complete:
+
+        {output_dir}/part-{t}-{pid}-{id}.npz    one array per `RESULT_COLUMNS` column, `flush_every` points
+        {output_dir}/_run.json                  settings and price digest the store was built with
+
+    A rerun (e.g. after a crash, or with a larger grid) skips the points already committed. Reusing a
+    store with other prices or settings raises ValueError.
+
+    Args:
+        price_path: prices, one column per asset
+        space: values of every `GRID_PARAMS` parameter, e.g. {'window': [250, 500], 'threshold': [1.5, 2],
+            'fee': [0.0004], 'slippage': [0, 0.0001]}
+        output_dir: results store
+        formation_end: first trading row
+        quantity_ratio, initial_cash: as in `pair_backtest`
+        pvalue, hurst: selection, as `PairTrading.pipeline`
+        min_lag, max_lag: Hurst exponent lags
+        chunk_size: pairs screened at a time, as `screen_pairs` (bounds a worker's memory)
+        max_workers: process pool size. Defaults to the number of CPUs
+        flush_every: finished points per committed part
+
+    Returns:
+        pd.DataFrame: every committed grid point (`load_grid_results`)
+    """
+    missing = set(GRID_PARAMS) - set(space)
+    if missing:
+        raise ValueError(f"run_grid: missing grid parameters {sorted(missing)}")
+    if max(space['window']) > formation_end:
+        raise ValueError("run_grid: formation windows must fit before formation_end")
+
+    X = np.ascontiguousarray(price_path.to_numpy(dtype=np.float64))
+    settings = {
+        'columns': [str(c) for c in price_path.columns],
+        'prices': hashlib.blake2b(X.tobytes(), digest_size=16).hexdigest(),
+        'formation_end': formation_end,
+        'quantity_ratio': quantity_ratio,
+        'initial_cash': initial_cash,
+        'pvalue': pvalue,
+        'hurst': hurst,
+        'min_lag': min_lag,
+        'max_lag': max_lag,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    run_file = os.path.join(output_dir, '_run.json')
+    if os.path.exists(run_file):
+        with open(run_file) as f:
+            if json.load(f) != settings:
+                raise ValueError(f"run_grid: {output_dir} holds results of other prices or settings")
+    else:
+        _atomic_write(run_file, lambda tmp: _save_json(tmp, settings))
+
+    done = set(load_grid_results(output_dir)['key'])
+    points = [params for params in parameter_grid(space) if point_key(params) not in done]
+    # Same window next to each other, so a worker's screening is reused
+    points.sort(key=lambda params: params['window'])
+    print(f"{len(done)} grid points already done, {len(points)} to run")
+
+    args = (formation_end, pvalue, hurst, (min_lag, max_lag, None, 'aic'), quantity_ratio, initial_cash, chunk_size)
+    segment = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+    rows = []
+    try:
+        np.ndarray(X.shape, dtype=np.float64, buffer=segment.buf)[:] = X
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(segment.name, X.shape)) as executor:
+            futures = [executor.submit(_run_point, params, *args) for params in points]
+            for future in as_completed(futures):
+                rows.append(future.result())
+                if len(rows) >= flush_every:
+                    _flush(output_dir, rows)
+    finally:
+        # Whatever finished before an error is kept
+        _flush(output_dir, rows)
+        segment.close()
+        segment.unlink()
+
+    return load_grid_results(output_dir)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    T, N = 1500, 30
+    common = np.cumsum(rng.normal(size=(T, 3)), axis=0)
+    prices = pd.DataFrame(
+        100 + common[:, rng.integers(0, 3, N)] * rng.uniform(0.5, 2, N) + np.cumsum(rng.normal(scale=0.3, size=(T, N)), axis=0),
+        columns=[f"A{k}" for k in range(N)]
+    )
+    space = {'window': [250, 500], 'threshold': [1.0, 1.5, 2.0], 'fee': [0.0, 0.0004], 'slippage': [0.0, 0.0001]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        # A first run over part of the grid stands in for a crashed one
+        start_time = time.perf_counter()
+        run_grid(prices, {**space, 'threshold': [1.0]}, directory, formation_end=1000, initial_cash=100_000.0, max_workers=2, flush_every=2)
+        partial_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        results = run_grid(prices, space, directory, formation_end=1000, initial_cash=100_000.0, max_workers=2, flush_every=4)
+        print(f"First run {partial_seconds:.2f}s, resumed run {time.perf_counter() - start_time:.2f}s")
+        assert len(results) == len(parameter_grid(space)) and results['key'].is_unique
+
+        # Same numbers as running every point from scratch in one process
+        _attach_segment = shared_memory.SharedMemory(create=True, size=prices.to_numpy().nbytes)
+        try:
+            X = prices.to_numpy(dtype=np.float64)
+            np.ndarray(X.shape, dtype=np.float64, buffer=_attach_segment.buf)[:] = X
+            _attach(_attach_segment.name, X.shape)
+            expected = pd.DataFrame([_run_point(params, 1000, 0.05, 0.5, (2, 60, None, 'aic'), 0.5, 100_000.0)
+                                     for params in parameter_grid(space)])
+        finally:
+            _SEGMENT.close()
+            _attach_segment.close()
+            _attach_segment.unlink()
+        merged = results.set_index('key').loc[expected['key']]
+        columns = ['pairs', 'trades', 'final_equity', 'max_drawdown']
+        np.testing.assert_allclose(merged[columns].to_numpy(dtype=float), expected[columns].to_numpy(dtype=float))
+
+        # Screening in small chunks selects the same pairs; NumPy grid values key like Python ones
+        _attach_segment = shared_memory.SharedMemory(create=True, size=X.nbytes)
+        try:
+            np.ndarray(X.shape, dtype=np.float64, buffer=_attach_segment.buf)[:] = X
+            _attach(_attach_segment.name, X.shape)
+            for whole, chunked in zip(_formation(500, 1000, 0.05, 0.5, (2, 60, None, 'aic')),
+                                      _formation(500, 1000, 0.05, 0.5, (2, 60, None, 'aic'), chunk_size=7)):
+                np.testing.assert_array_equal(whole, chunked)
+        finally:
+            _SEGMENT.close()
+            _attach_segment.close()
+            _attach_segment.unlink()
+        numpy_space = {name: list(np.asarray(values)) for name, values in space.items()}
+        assert [point_key(params) for params in parameter_grid(numpy_space)] == [point_key(params) for params in parameter_grid(space)]
+        print(f"OK - {len(results)} grid points, resumed run matches a fresh one")
+        print(results.sort_values('total_return', ascending=False)[GRID_PARAMS + ['pairs', 'trades', 'total_return', 'max_drawdown']].head().to_string())
+
+    # Formation windows with fewer than two complete assets select no pairs instead of failing
+    sparse = prices.copy()
+    sparse.iloc[400:900, 1:] = np.nan
+    with tempfile.TemporaryDirectory() as directory:
+        empty = run_grid(sparse, {**space, 'fee': [0.0], 'slippage': [0.0]}, directory, formation_end=1000,
+                         initial_cash=100_000.0, max_workers=2)
+        assert (empty['pairs'] == 0).all() and (empty['final_equity'] == 100_000.0).all()
+    print(f"OK - {len(empty)} grid points on sparse formation windows, no pairs selected")
@@ -1,4 +1,4 @@
-from typing import Literal, Dict, List
+from typing import Literal, Dict, List, Hashable
 # from src.models.trading.asset import Asset
 from src.models.trading.asset import AccountAsset
 import uuid
@@ -49,6 +49,8 @@ import uuid
     
     
 class Order:
+    __slots__ = ('asset', 'price', 'quantity_ratio', 'side')
+
     def __init__(self, asset: str, price: float, quantity_ratio: float, side: Literal["buy", "sell"] | None = None):
         self.asset = asset
         self.price = price
@@ -57,9 +59,17 @@ class Order:
 
 
 class AccountPortfolio:
-    def __init__(self, initial_cash: float = 1000.0):
-        self.assets: Dict[str, Dict[str, AccountAsset]] = dict()  # {trade_id: {asset: AccountAsset}}
+    def __init__(self, initial_cash: float = 1000.0, uuid_keys: bool = False):
+        """
+        Args:
+            initial_cash: starting cash
+            uuid_keys: `pair_enter` returns uuid4 strings (the former keys) instead of integer trade ids
+        """
+        self.assets: Dict[Hashable, Dict[str, AccountAsset]] = dict()  # {trade_id: {asset: AccountAsset}}
         self.cash = initial_cash
+        self.uuid_keys = uuid_keys
+        self._next_id = 1  # Ids start at 1: always truthy, like the former uuid keys
+        self._uuids: Dict[int, str] = dict()  # External ids handed out by `trade_uuid`
 
     def __repr__(self):
         a = list()
@@ -80,8 +90,20 @@ Cash: {self.cash}
 """
         return repr
 
+    def new_trade_id(self) -> int:
+        """Monotonic integer trade id from 1, unique within this portfolio"""
+        self._next_id += 1
+        return self._next_id - 1
+
+    def trade_uuid(self, id: int) -> str:
+        """Stable uuid4 string of an integer trade id, for external reporting (created on first request)"""
+        key = self._uuids.get(id)
+        if key is None:
+            key = self._uuids[id] = str(uuid.uuid4())
+        return key
+
     def enter_position(self, 
-                       id: str,
+                       id: Hashable,
                        order: Order, 
                        fee: float = 0.0, 
                        slippage: float = 0.0):
@@ -112,7 +134,7 @@ Cash: {self.cash}
         return True
 
     def exit_position(self,
-                      id: str,
+                      id: Hashable,
                       exit_order: Order,
                       fee: float = 0.0, 
                       slippage: float = 0.0):
@@ -139,21 +161,21 @@ Cash: {self.cash}
 
         return True
 
-    def pair_enter(self, order1: Order, order2: Order, fee: float = 0.0, slippage: float = 0.0) -> str:  # Retu
-        key = uuid.uuid4()
+    def pair_enter(self, order1: Order, order2: Order, fee: float = 0.0, slippage: float = 0.0) -> int | str | None:  # Returns the trade id
+        key = str(uuid.uuid4()) if self.uuid_keys else self.new_trade_id()
 
         # Enter position
-        success1 = self.enter_position(str(key), order1, fee, slippage)
-        success2 = self.enter_position(str(key), order2, fee, slippage)
+        success1 = self.enter_position(key, order1, fee, slippage)
+        success2 = self.enter_position(key, order2, fee, slippage)
 
         if not success1 and not success2:
             print("Failed to enter pair position")
             return None
 
         # Return pair key
-        return str(key)
+        return key
 
-    def pair_exit(self, id: str, long_order: Order, short_order: Order, fee: float = 0.0, slippage: float = 0.0):
+    def pair_exit(self, id: Hashable, long_order: Order, short_order: Order, fee: float = 0.0, slippage: float = 0.0):
         success1 = self.exit_position(id, long_order, fee, slippage)
         success2 = self.exit_position(id, short_order, fee, slippage)
 
@@ -172,7 +194,7 @@ Cash: {self.cash}
 
                 print(f"FORCE LIQUIDATION {trade_id}. {a1}. for {round(price, 4)}")
 
-    def force_remove_by_id(self, id: str):
+    def force_remove_by_id(self, id: Hashable):
         del self.assets[id]
             
         
@@ -180,3 +202,47 @@ Cash: {self.cash}
 #     p = Portfolio()
 #     p.pair_enter("a1", 10, 10, "a2", 10, 10)
 #     p.pair_exit("a1", 11, 1, "a2", 9, 1)  # Remember that it uses ratio
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    def fills_per_second(portfolio: AccountPortfolio, order_class: type = Order, rounds: int = 200_000) -> float:
+        """Pair round trips (2 entry + 2 exit fills each) on one portfolio"""
+        start_time = time.perf_counter()
+        for k in range(rounds):
+            price = 10.0 + (k % 7) * 0.1
+            key = portfolio.pair_enter(order_class("A", price, 0.001, "buy"), order_class("B", price + 1, 0.001, "sell"), 0.0004, 0.0001)
+            portfolio.pair_exit(key, order_class("A", price + 0.05, 1), order_class("B", price + 1.02, 1), 0.0004, 0.0001)
+        return 4 * rounds / (time.perf_counter() - start_time)
+
+    def unslotted(cls: type) -> type:
+        """Copy of a slotted class with a per-instance __dict__, as before the slots were added"""
+        skip = {'__slots__', '__dict__', '__weakref__', *cls.__slots__}
+        return type(cls.__name__, cls.__bases__, {name: value for name, value in vars(cls).items() if name not in skip})
+
+    # Before: unslotted Order / AccountAsset and uuid4 keys (enter_position creates legs through the
+    # module's AccountAsset, swapped for the duration of the run)
+    slotted_asset = AccountAsset
+    AccountAsset = unslotted(slotted_asset)
+    try:
+        probe = AccountPortfolio(1e9)
+        probe.enter_position(0, unslotted(Order)("A", 10.0, 0.1, "buy"))
+        assert hasattr(probe.assets[0]["A"], '__dict__')
+        before = fills_per_second(AccountPortfolio(1e9, uuid_keys=True), unslotted(Order))
+    finally:
+        AccountAsset = slotted_asset
+    legacy = fills_per_second(AccountPortfolio(1e9, uuid_keys=True))
+    integer = fills_per_second(AccountPortfolio(1e9))
+    print(f"unslotted, uuid4 keys: {before:,.0f} fills/s")
+    print(f"slotted, uuid4 keys:   {legacy:,.0f} fills/s ({legacy / before:.2f}x)")
+    print(f"slotted, integer keys: {integer:,.0f} fills/s ({integer / before:.2f}x)")
+
+    order, asset = Order("A", 10.0, 0.5, "buy"), AccountAsset("A", 10.0, 1.0, "buy")
+    print(f"Order {sys.getsizeof(order)} bytes, AccountAsset {sys.getsizeof(asset)} bytes (slotted, no __dict__)")
+
+    portfolio = AccountPortfolio(1e9)
+    key = portfolio.pair_enter(Order("A", 10.0, 0.1, "buy"), Order("B", 11.0, 0.1, "sell"))
+    assert key == 1 and portfolio.pair_enter(Order("A", 10.0, 0.1, "buy"), Order("B", 11.0, 0.1, "sell")) == 2
+    assert portfolio.trade_uuid(key) == portfolio.trade_uuid(key) != portfolio.trade_uuid(2)
@@ -1,4 +1,7 @@
 import pandas as pd
+import numpy as np
+
+from typing import Tuple
 
 
 class Threshold2Sigma:
@@ -48,5 +51,210 @@ class Threshold2Sigma:
                     life.append([s, None, None])
 
         return pd.DataFrame(life, columns=columns, index=self.asset_spread.index)
-    
-    
\ No newline at end of file
+
+    def position_signals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        `position_lifecycle` as int8 arrays, without the per-row Python loop.
+
+        The state machine only moves on the sign of the spread, so it is solved per run of same-sign
+        spreads (see `_run_positions`) instead of per row. Starts from and updates `self.position`
+        like `position_lifecycle`. Negative thresholds fall back to a scan.
+
+        Returns:
+            (position after each row: 1 short asset1 / long asset2, -1 the opposite, 0 flat,
+             asset1 action on each row: 1 buy, -1 sell, 0 none - asset2 always takes the opposite side)
+        """
+        spread = self.asset_spread.to_numpy(dtype=np.float64)
+        if self.threshold < 0:
+            position = self._position_scan(spread)
+        else:
+            # A virtual first bar that enters the current position from flat
+            s = np.concatenate([[np.inf * self.position if self.position else 0.0], spread])
+            position = _run_positions(_spread_runs(s, len(s)), self.threshold)[0]
+
+            action = -np.diff(position).astype(np.int8)
+            position = position[1:]
+            self.position = int(position[-1]) if len(position) else self.position
+            return position, action
+
+        action = -np.diff(position, prepend=np.int8(self.position)).astype(np.int8)
+        self.position = int(position[-1]) if len(position) else self.position
+        return position, action
+
+    def _position_scan(self, spread: np.ndarray) -> np.ndarray:
+        """Row by row state machine of `position_lifecycle` on numbers, for any threshold"""
+        position = np.empty(len(spread), dtype=np.int8)
+        state = self.position
+        for k, s in enumerate(spread):
+            if state == 1:
+                state = 0 if s < 0 else 1
+            elif state == -1:
+                state = 0 if s > 0 else -1
+            elif s > self.threshold:
+                state = 1
+            elif s < -self.threshold:
+                state = -1
+            position[k] = state
+        return position
+
+    @staticmethod
+    def lifecycle_frame(asset_spread: pd.Series, action: np.ndarray) -> pd.DataFrame:
+        """The `position_lifecycle` frame (spread, "buy" / "sell" / None per asset) from an action array"""
+        labels = np.array([None, "buy", "sell"], dtype=object)
+        return pd.DataFrame(
+            {"spread": asset_spread.to_numpy(), "asset1": labels[action], "asset2": labels[-action]},
+            index=asset_spread.index,
+        )
+
+
+def _spread_runs(s: np.ndarray, length: int) -> dict:
+    """
+    Runs of same-sign spread. `s` holds one or more series of `length` rows laid end to end.
+
+    Zeros and NaN belong to no run: they never enter nor exit a position.
+    """
+    sign = np.where(np.isnan(s), 0.0, np.sign(s))
+    magnitude = np.where(np.isnan(s), 0.0, np.abs(s))
+    nonzero = np.flatnonzero(sign)
+    series = nonzero // length
+    first = np.ones(len(nonzero), dtype=bool)
+    first[1:] = (sign[nonzero[1:]] != sign[nonzero[:-1]]) | (series[1:] != series[:-1])
+
+    run_start = nonzero[first]
+    run_series = series[first]
+    series_first = np.r_[True, run_series[1:] != run_series[:-1]] if len(run_start) else np.zeros(0, dtype=bool)
+    next_start = np.r_[run_start[1:], 0]
+    run_end = np.where(np.r_[~series_first[1:], False], next_start, (run_series + 1) * length)
+    later = np.where(first, 0.0, magnitude[nonzero])
+
+    return {
+        'size': len(s),
+        'length': length,
+        'magnitude': magnitude,
+        'start': run_start,
+        'end': run_end,
+        'sign': sign[run_start],
+        'series': run_series,
+        'series_first': series_first,
+        'first_magnitude': magnitude[run_start],
+        'later_magnitude': np.maximum.reduceat(later, np.flatnonzero(first)) if len(run_start) else np.zeros(0),
+    }
+
+
+def _run_positions(runs: dict, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    `Threshold2Sigma` positions of every series in `runs`, all starting flat, for a threshold >= 0.
+
+    A position taken in a positive run (spread > threshold) holds until the first negative spread and
+    vice versa, and no position is entered on an exit bar. So a run ends in a position if it has an
+    entry bar after its first bar, or if its first bar is an entry bar and the previous run ended flat
+    (otherwise that first bar is the previous position's exit). Runs decided by the first bar alone
+    alternate with their predecessor; `np.maximum.accumulate` over the last run decided by the
+    first rule resolves those chains. A position opens on the first entry bar from the run start (or
+    the bar after it, following an exit) and closes on the first bar of the next run.
+
+    Returns:
+        (positions, entry rows, exit rows (the series end when still open), signs of the trades)
+    """
+    n = runs['size']
+    if not len(runs['start']):
+        empty = np.zeros(0, dtype=np.int64)
+        return np.zeros(n, dtype=np.int8), empty, empty, np.zeros(0)
+
+    first_entry = runs['first_magnitude'] > threshold
+    later_entry = runs['later_magnitude'] > threshold
+    decided = later_entry | ~first_entry
+    run = np.arange(len(first_entry))
+    series_start = np.maximum.accumulate(np.where(runs['series_first'], run, 0))
+    last_decided = np.maximum.accumulate(np.where(decided, run, -1))
+    known = last_decided >= series_start
+    base = np.where(known, later_entry[np.maximum(last_decided, 0)], False)
+    distance = run - np.where(known, last_decided, series_start - 1)
+    active = np.where(decided, later_entry, base ^ (distance % 2 == 1))
+
+    after_exit = np.r_[False, active[:-1]] & ~runs['series_first']
+    entry = runs['magnitude'] > threshold
+    next_entry = np.minimum.accumulate(np.where(entry, np.arange(n), n)[::-1])[::-1]
+    opened = next_entry[np.minimum(runs['start'] + after_exit, n - 1)][active]
+    closed = runs['end'][active]
+    side = runs['sign'][active]
+
+    change = np.zeros(n + 1)
+    np.add.at(change, opened, side)
+    np.add.at(change, closed, -side)
+    return np.cumsum(change[:-1]).astype(np.int8), opened, closed, side
+
+
+def threshold_sweep(spreads: pd.DataFrame | np.ndarray, thresholds: np.ndarray) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    `Threshold2Sigma` lifecycles of every (threshold, spread) combination at once.
+
+    The run structure of the spreads is computed once; every threshold is then one vectorized pass
+    over all spreads together. No per-combination objects are built.
+
+    Args:
+        spreads: T x P spreads, one column per pair
+        thresholds: K thresholds (>= 0)
+
+    Returns:
+        (K x T x P int8 positions, as `Threshold2Sigma.position_signals`,
+         summary per (threshold, pair): trades, holding_bars (total rows in a position, open trades
+         counted to the end), mean_holding and exposure (fraction of rows in a position))
+    """
+    columns = spreads.columns if isinstance(spreads, pd.DataFrame) else pd.RangeIndex(np.shape(spreads)[1])
+    S = np.asarray(spreads, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64).ravel()
+    if (thresholds < 0).any():
+        raise ValueError("threshold_sweep: thresholds must be non-negative")
+    T, P = S.shape
+
+    runs = _spread_runs(S.T.ravel(), T)
+    positions = np.empty((len(thresholds), T, P), dtype=np.int8)
+    trades = np.empty((len(thresholds), P), dtype=np.int64)
+    holding = np.empty((len(thresholds), P))
+    for k, threshold in enumerate(thresholds):
+        position, opened, closed, _side = _run_positions(runs, threshold)
+        positions[k] = position.reshape(P, T).T
+        pair = opened // T if T else opened
+        trades[k] = np.bincount(pair, minlength=P)
+        holding[k] = np.bincount(pair, weights=closed - opened, minlength=P)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary = pd.DataFrame({
+            'trades': trades.ravel(),
+            'holding_bars': holding.ravel(),
+            'mean_holding': (holding / trades).ravel(),
+            'exposure': (holding / T).ravel(),
+        }, index=pd.MultiIndex.from_product([thresholds, columns], names=['threshold', 'pair']))
+    return positions, summary
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    spread = pd.Series(np.sin(np.arange(10 ** 6) / 50) * 2 + rng.normal(size=10 ** 6))
+    spread[rng.random(len(spread)) < 0.01] = np.nan
+
+    start_time = time.perf_counter()
+    expected = Threshold2Sigma(spread, 1.5).position_lifecycle()
+    loop_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    position, action = Threshold2Sigma(spread, 1.5).position_signals()
+    vectorized_seconds = time.perf_counter() - start_time
+
+    pd.testing.assert_frame_equal(expected, Threshold2Sigma.lifecycle_frame(spread, action))
+    print(f"OK - same lifecycle. Loop {loop_seconds:.2f}s, vectorized {vectorized_seconds:.3f}s "
+          f"({loop_seconds / vectorized_seconds:.0f}x), {np.count_nonzero(action)} actions")
+
+    # Threshold sweep vs. one Threshold2Sigma per combination
+    spreads = np.sin(np.arange(5000)[:, None] / 50 + rng.uniform(0, 6, 300)) * 2 + rng.normal(size=(5000, 300))
+    thresholds = np.linspace(0.5, 3, 50)
+    start_time = time.perf_counter()
+    positions, summary = threshold_sweep(spreads, thresholds)
+    print(f"Sweep of {len(thresholds)} thresholds x {spreads.shape[1]} pairs: {time.perf_counter() - start_time:.2f}s")
+    for k, p in [(0, 0), (25, 150), (49, 299)]:
+        expected, _ = Threshold2Sigma(pd.Series(spreads[:, p]), thresholds[k]).position_signals()
+        assert (positions[k, :, p] == expected).all()
+    print(summary.groupby(level='threshold')[['trades', 'mean_holding']].mean().iloc[::10])